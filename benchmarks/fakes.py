@@ -0,0 +1,100 @@
+"""
+Local stand-ins for the external services (Groq, AWS Transcribe, ElevenLabs) so the
+pipeline can be timed without network calls. Each fake sleeps for a fixed latency
+to model the service round trip, and honours the request timeout the pipeline passes
+the way the real client would: it gives up after `timeout` seconds and fails.
+"""
+import time
+from types import SimpleNamespace
+
+
+class StubLLMClient:
+    """
+    Mimics the `client.chat.completions.create(...)` and `client.with_options(...)` interface
+    of the Groq SDK, including its retries: a timed-out request is retried `max_retries`
+    times (2 by default, as in the SDK), each attempt getting the full timeout again.
+    """
+
+    # The SDK waits 0.5s, then 1s, ... between attempts
+    RETRY_BACKOFF_SECONDS = 0.5
+
+    def __init__(self, latency=0.0, answer="This is a stubbed answer.", max_retries=2, timeout=None):
+        self.latency = latency
+        self.answer = answer
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.calls = 0
+        self.attempts = 0
+        self.prompt_chars = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def with_options(self, max_retries=None, timeout=None):
+        """A view of this client with other defaults; calls are counted on this client."""
+        def create(messages, model=None, **kwargs):
+            kwargs.setdefault("timeout", timeout)
+            kwargs.setdefault("max_retries", max_retries)
+            return self._create(messages, model, **kwargs)
+        return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+    def _create(self, messages, model=None, timeout=None, max_retries=None, **kwargs):
+        self.calls += 1
+        self.prompt_chars += sum(len(message["content"]) for message in messages)
+        timeout = timeout if timeout is not None else self.timeout
+        max_retries = self.max_retries if max_retries is None else max_retries
+        if timeout is not None and self.latency > timeout:
+            for attempt in range(max_retries + 1):
+                self.attempts += 1
+                if attempt:
+                    time.sleep(self.RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1))
+                time.sleep(timeout)
+            raise TimeoutError(f"stub LLM request timed out after {max_retries + 1} attempts of {timeout:.2f}s")
+        self.attempts += 1
+        if self.latency:
+            time.sleep(self.latency)
+        message = SimpleNamespace(content=self.answer)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def stub_interpret_command(latency=0.0):
+    """Replacement for nlp_pipeline.interpret_command_with_api that echoes the system output back."""
+    def interpret(user_input, timeout=None):
+        if timeout is not None and latency > timeout:
+            time.sleep(timeout)
+            return "Error interpreting command."
+        if latency:
+            time.sleep(latency)
+        start = user_input.find("SYSTEM_OUTPUT: ")
+        end = user_input.find("; .", start)
+        return user_input[start + len("SYSTEM_OUTPUT: "):end] if start >= 0 and end > start else user_input
+    return interpret
+
+
+class FakeASR:
+    """Returns a known transcript after a fixed finalization delay."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def transcribe(self, transcript):
+        if self.latency:
+            time.sleep(self.latency)
+        return transcript
+
+
+class FakeTTS:
+    """Writes a silent placeholder MP3 after a delay proportional to the text length."""
+
+    def __init__(self, latency=0.0, seconds_per_char=0.0):
+        self.latency = latency
+        self.seconds_per_char = seconds_per_char
+
+    def save_audio_from_text(self, text, output_file, index, timeout=None):
+        delay = self.latency + self.seconds_per_char * len(text)
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            return False
+        if delay:
+            time.sleep(delay)
+        with open(output_file, "wb") as f:
+            f.write(b"\xff\xfb\x90\x00" * 64)
+        return True
@@ -0,0 +1,314 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# Replays never call Groq; response_gen only needs the variable to be set at import
+os.environ.setdefault("GROQ_API_KEY", "unused-for-replay")
+
+from benchmarks.fakes import StubLLMClient, FakeASR, FakeTTS, stub_interpret_command
+from modules import metrics
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".flac", ".m4a")
+STAGES = ("asr", "rag", "rephrase", "tts", "total")
+# Speaking time assumed for a turn without timestamps (about 150 words per minute)
+SECONDS_PER_WORD = 0.4
+# Whisper works on 16 kHz mono audio
+WHISPER_SAMPLE_RATE = 16000
+# Budget given to turns when --turn_slo is 0: long enough that no stage ever falls back
+NO_SLO_SECONDS = 24 * 3600.0
+
+
+def rss_mb():
+    """Resident set size of this process in MB, or None where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return None
+
+
+_whisper_models = {}
+_whisper_lock = threading.Lock()
+
+
+def whisper_model_cache(name):
+    import whisper
+    with _whisper_lock:
+        if name not in _whisper_models:
+            _whisper_models[name] = whisper.load_model(name)
+        return _whisper_models[name]
+
+
+def audio_segments(path, whisper_model):
+    """
+    User turns of a recording with timestamps, from a sidecar transcript JSON if there is one,
+    otherwise from a Whisper pass over the whole file. This only finds the turn boundaries;
+    each turn's audio is transcribed again, and timed, when it is replayed.
+    """
+    from modules.intent_recognition import load_transcript
+    sidecar = Path(path).with_suffix(".json")
+    if sidecar.exists():
+        return load_transcript(str(sidecar))
+    result = whisper_model_cache(whisper_model).transcribe(str(path))
+    return [{"speaker_id": "speaker_1", "text": segment["text"].strip(), "start": segment["start"], "end": segment["end"]}
+            for segment in result["segments"]]
+
+
+def load_session(path, whisper_model):
+    """
+    The user turns of one recorded session as (text, speaking_seconds, gap_seconds, clip):
+    how long the user spoke, the silence before they started, and for audio sessions the
+    turn's samples, which are transcribed with Whisper inside the turn (None for transcripts).
+    """
+    from modules.intent_recognition import load_transcript
+    audio = None
+    if path.lower().endswith(AUDIO_EXTENSIONS):
+        import whisper
+        audio = whisper.load_audio(str(path))
+        segments = audio_segments(path, whisper_model)
+    else:
+        segments = load_transcript(path)
+    turns = []
+    previous_end = None
+    for segment in segments:
+        if not isinstance(segment, dict) or segment.get("speaker_id") != "speaker_1":
+            continue
+        text = str(segment.get("text", "")).strip()
+        if not text or text == "...":
+            continue
+        timed = "start" in segment and "end" in segment
+        if timed:
+            speaking = max(0.0, float(segment["end"]) - float(segment["start"]))
+            gap = max(0.0, float(segment["start"]) - previous_end) if previous_end is not None else 0.0
+            previous_end = float(segment["end"])
+        else:
+            speaking = SECONDS_PER_WORD * len(text.split())
+            gap = 0.0
+        clip = None
+        if audio is not None:
+            if not timed:
+                print(f"Warning: a turn in {path} has no timestamps; its audio cannot be cut out, using the fake ASR.")
+            else:
+                clip = audio[int(float(segment["start"]) * WHISPER_SAMPLE_RATE):int(float(segment["end"]) * WHISPER_SAMPLE_RATE)]
+        turns.append((text, speaking, gap, clip))
+    return turns
+
+
+class Replayer:
+    """
+    Drives recorded turns through the voice app's own turn pipeline (modules/voice_session.py):
+    speculative retrieval on partial transcripts, shard routing, retrieval + LLM, rephrasing,
+    the conversation store and TTS, with local stand-ins for the external services.
+    """
+
+    def __init__(self, args):
+        from modules import response_gen, nlp_pipeline
+        from modules.conversation_store import ConversationStore
+        self.llm = StubLLMClient(latency=args.llm_latency)
+        response_gen.client = self.llm
+        nlp_pipeline.interpret_command_with_api = stub_interpret_command(latency=args.rephrase_latency)
+        self.asr = FakeASR(latency=args.asr_latency)
+        self.tts = FakeTTS(latency=args.tts_latency, seconds_per_char=args.tts_seconds_per_char)
+        self.speed = args.speed
+        self.turn_slo = args.turn_slo
+        self.partials = not args.no_partials
+        self.whisper_model = args.whisper_model
+        self.audio_dir = tempfile.mkdtemp(prefix="replay-")
+        # Replayed turns go to their own database unless one is given, so they never mix with real sessions
+        self.db_path = args.conversation_db or os.path.join(self.audio_dir, "conversations.db")
+        self.store = ConversationStore(self.db_path)
+        # The voice app plays a pre-rendered filler clip; render the fake one once up front
+        self.filler_clip = os.path.join(self.audio_dir, "filler.mp3")
+        self.tts.save_audio_from_text("filler", self.filler_clip, 0)
+
+    def transcribe(self, text, clip):
+        """The turn's final transcript: local Whisper on its audio, otherwise the fake ASR's delay."""
+        if clip is None:
+            return self.asr.transcribe(text)
+        model = whisper_model_cache(self.whisper_model)
+        # One Whisper model is shared by the concurrent sessions and is not thread-safe
+        with _whisper_lock:
+            return model.transcribe(clip)["text"].strip()
+
+    def speak(self, session, text, speaking):
+        """The user's speech: word-by-word partial transcripts over `speaking` seconds, as streaming ASR sends them."""
+        words = text.split()
+        if not self.partials:
+            if self.speed:
+                time.sleep(speaking / self.speed)
+            return
+        for n in range(1, len(words) + 1):
+            if self.speed:
+                time.sleep(speaking / len(words) / self.speed)
+            session.observe_partial(" ".join(words[:n]), stable=True)
+
+    def replay_session(self, name, turns):
+        from modules.voice_session import VoiceSession
+        from modules.deadline import Deadline
+        session = VoiceSession(session_id=name, store=self.store, tts_fn=self.tts.save_audio_from_text,
+                               filler_clip_fn=lambda text: self.filler_clip)
+        stages = {stage: [] for stage in STAGES}
+        start = time.perf_counter()
+        for i, (text, speaking, gap, clip) in enumerate(turns):
+            if self.speed:
+                time.sleep(gap / self.speed)
+            # The user's speech happens before the turn's latency clock starts
+            self.speak(session, text, speaking)
+            t0 = time.perf_counter()
+            text = self.transcribe(text, clip)
+            t1 = time.perf_counter()
+            # As in the voice app, the turn's budget starts once the transcript is final
+            result = session.respond(text, "en-US", turn_id=i, deadline=Deadline(self.turn_slo or NO_SLO_SECONDS))
+            t2 = time.perf_counter()
+            audio_path = os.path.join(self.audio_dir, f"{threading.get_ident()}_{i}.mp3")
+            session.synthesize(result.response, audio_path, result.deadline)
+            t3 = time.perf_counter()
+            if os.path.exists(audio_path):
+                os.unlink(audio_path)
+            for stage, value in zip(STAGES, (t1 - t0, result.timings["rag"], result.timings["rephrase"], t3 - t2, t3 - t0)):
+                stages[stage].append(value)
+        session.speculative_retriever.shutdown()
+        return {"session": name, "turns": len(turns), "wall_s": time.perf_counter() - start, "stages": stages,
+                "speculative_hits": session.speculative_retriever.hits}
+
+    def close(self):
+        self.store.close()
+        shutil.rmtree(self.audio_dir, ignore_errors=True)
+
+
+def summarize(values):
+    values = np.asarray(values) * 1000
+    return {"mean_ms": float(values.mean()), "p50_ms": float(np.percentile(values, 50)),
+            "p95_ms": float(np.percentile(values, 95)), "max_ms": float(values.max())}
+
+
+class RssSampler:
+    """Samples the process RSS in a background thread, to spot memory growth over a soak run."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="rss-sampler")
+
+    def _run(self):
+        start = time.perf_counter()
+        while True:
+            rss = rss_mb()
+            if rss is not None:
+                self.samples.append((time.perf_counter() - start, rss))
+            if self._stop.wait(self.interval):
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded sessions through the pipeline with local stand-ins for Groq, Transcribe and ElevenLabs.")
+    parser.add_argument("inputs", type=str, nargs="+", help="Transcript JSON files (load_transcript format) or audio files.")
+    parser.add_argument("--speed", type=float, default=0.0, help="Pacing: 1 replays in real time, 4 at 4x, 0 (default) without pauses.")
+    parser.add_argument("--concurrency", type=int, default=1, help="Sessions replayed at the same time.")
+    parser.add_argument("--repeat", type=int, default=1, help="Replay every session this many times (soak test).")
+    parser.add_argument("--whisper_model", type=str, default="small", help="Local Whisper model for audio without a sidecar transcript.")
+    parser.add_argument("--llm_latency", type=float, default=0.0, help="Seconds each stubbed LLM call sleeps.")
+    parser.add_argument("--rephrase_latency", type=float, default=0.0, help="Seconds each stubbed rephrase call sleeps.")
+    parser.add_argument("--asr_latency", type=float, default=0.0, help="Seconds the fake ASR takes to finalize.")
+    parser.add_argument("--tts_latency", type=float, default=0.0, help="Seconds each fake TTS call sleeps.")
+    parser.add_argument("--tts_seconds_per_char", type=float, default=0.0, help="Extra fake TTS time per response character.")
+    parser.add_argument("--no_partials", action="store_true", help="Do not feed partial transcripts, so no retrieval is speculative.")
+    parser.add_argument("--conversation_db", type=str, default=None, help="Store the replayed turns in this SQLite file (default: a temporary one).")
+    parser.add_argument("--turn_slo", type=float, default=0.0, help="Per-turn deadline in seconds, with fallbacks as in the voice app (0 disables it).")
+    parser.add_argument("--rss_interval", type=float, default=1.0, help="Seconds between RSS samples.")
+    parser.add_argument("--output_json", type=str, default="replay_report.json")
+    args = parser.parse_args()
+
+    sessions = []
+    for path in args.inputs:
+        turns = load_session(path, args.whisper_model)
+        if turns:
+            sessions.append((Path(path).stem, turns))
+        else:
+            print(f"Warning: no user turns found in {path}, skipping.")
+    if not sessions:
+        print("Error: nothing to replay.")
+        sys.exit(1)
+    jobs = [(f"{name}#{r}" if args.repeat > 1 else name, turns) for r in range(args.repeat) for name, turns in sessions]
+
+    replayer = Replayer(args)
+    print(f"Replaying {len(jobs)} sessions ({sum(len(t) for _, t in jobs)} turns) with concurrency {args.concurrency}"
+          f"{f' at {args.speed}x speed' if args.speed else ''}...")
+    start = time.perf_counter()
+    with RssSampler(args.rss_interval) as sampler, ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda job: replayer.replay_session(*job), jobs))
+    wall = time.perf_counter() - start
+    replayer.close()
+
+    total_turns = sum(result["turns"] for result in results)
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key != "inputs"},
+        "sessions": [{"session": r["session"], "turns": r["turns"], "wall_s": r["wall_s"],
+                      "stages": {stage: summarize(values) for stage, values in r["stages"].items()}} for r in results],
+        "aggregate": {
+            "sessions": len(results),
+            "turns": total_turns,
+            "wall_s": wall,
+            "turns_per_sec": total_turns / wall,
+            "llm_calls": replayer.llm.calls,
+            "speculative_hits": sum(r["speculative_hits"] for r in results),
+            "stages": {stage: summarize([v for r in results for v in r["stages"][stage]]) for stage in STAGES},
+        },
+    }
+    if args.turn_slo:
+        counters = metrics.snapshot()["counters"]
+        turns = counters.get("slo.turns", 0) or 1
+        report["slo"] = {
+            "budget_s": args.turn_slo,
+            "miss_rate": counters.get("slo.misses", 0) / turns,
+            "miss_reasons": {name[len("slo.miss."):]: count for name, count in counters.items() if name.startswith("slo.miss.")},
+            "fallback_rates": {name[len("slo.fallback."):]: count / turns for name, count in counters.items() if name.startswith("slo.fallback.")},
+        }
+    if sampler.samples:
+        rss = [value for _, value in sampler.samples]
+        report["rss_mb"] = {"start": rss[0], "peak": max(rss), "end": rss[-1], "growth": rss[-1] - rss[0],
+                            "samples": sampler.samples}
+
+    print(f"{'session':<28}{'turns':>6}{'total p50':>12}{'total p95':>12}{'rag p50':>10}{'tts p50':>10}")
+    for session in report["sessions"]:
+        stages = session["stages"]
+        print(f"{session['session'][:27]:<28}{session['turns']:>6}{stages['total']['p50_ms']:>10.1f}ms"
+              f"{stages['total']['p95_ms']:>10.1f}ms{stages['rag']['p50_ms']:>8.1f}ms{stages['tts']['p50_ms']:>8.1f}ms")
+    aggregate = report["aggregate"]
+    print(f"{aggregate['turns']} turns in {aggregate['wall_s']:.1f}s ({aggregate['turns_per_sec']:.2f} turns/s); "
+          + ", ".join(f"{stage} p95 {aggregate['stages'][stage]['p95_ms']:.1f}ms" for stage in STAGES))
+    print(f"Speculative retrieval reused for {aggregate['speculative_hits']} of {aggregate['turns']} turns")
+    if "slo" in report:
+        slo = report["slo"]
+        print(f"SLO {slo['budget_s']}s: {slo['miss_rate']:.1%} of turns missed (by stage: {slo['miss_reasons'] or 'none'}); "
+              f"fallback rates: {', '.join(f'{k} {v:.1%}' for k, v in slo['fallback_rates'].items()) or 'none'}")
+    if "rss_mb" in report:
+        print(f"RSS: {report['rss_mb']['start']:.0f} MB at start, {report['rss_mb']['peak']:.0f} MB peak, "
+              f"{report['rss_mb']['growth']:+.0f} MB over the run")
+
+    with open(args.output_json, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved to {args.output_json}")
+
+
+if __name__ == "__main__":
+    main()
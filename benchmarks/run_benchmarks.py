@@ -0,0 +1,193 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# The suites never call Groq; response_gen only needs the variable to be set at import
+os.environ.setdefault("GROQ_API_KEY", "unused-for-benchmarks")
+
+from benchmarks.fakes import StubLLMClient, FakeASR, FakeTTS, stub_interpret_command
+
+SUITES = ("encoder", "faiss", "csv", "turn")
+
+
+def load_questions(test_csv):
+    df = pd.read_csv(test_csv)
+    df.columns = [col.lower() for col in df.columns]
+    return [str(q) for q in df["questions"]]
+
+
+def metric(value, unit, better="lower"):
+    return {"value": value, "unit": unit, "better": better}
+
+
+def bench_encoder(questions, args):
+    """Query-encoder latency and throughput at several batch sizes."""
+    from modules.encoder import QueryEncoder, benchmark
+    encoder = QueryEncoder(backend=args.encoder_backend, num_threads=args.threads)
+    results = {}
+    for batch_size, result in benchmark(encoder, questions, args.batch_sizes, args.repeats).items():
+        results[f"encoder.batch{batch_size}.latency_ms"] = metric(result["latency_ms"], "ms")
+        results[f"encoder.batch{batch_size}.throughput"] = metric(result["texts_per_sec"], "texts/s", "higher")
+    return results
+
+
+def bench_faiss(questions, args):
+    """Flat L2 search latency over synthetic 768-d vectors at several index sizes."""
+    import faiss
+    rng = np.random.default_rng(0)
+    dim = 768
+    queries = rng.standard_normal((args.faiss_queries, dim), dtype=np.float32)
+    results = {}
+    for size in args.faiss_sizes:
+        index = faiss.IndexFlatL2(dim)
+        # Add in blocks so the 1M case does not need a second full copy of the vectors
+        for start in range(0, size, 100_000):
+            index.add(rng.standard_normal((min(100_000, size - start), dim), dtype=np.float32))
+        index.search(queries[:1], 5)  # warm-up
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query[None, :], 5)
+            timings.append(time.perf_counter() - start)
+        results[f"faiss.flat_l2.{size}.p50_ms"] = metric(1000 * float(np.percentile(timings, 50)), "ms")
+        results[f"faiss.flat_l2.{size}.p95_ms"] = metric(1000 * float(np.percentile(timings, 95)), "ms")
+        del index
+    return results
+
+
+def bench_csv(questions, args):
+    """generate_csv_with_answers end to end with a stub LLM."""
+    from modules import response_gen
+    response_gen.client = StubLLMClient(latency=args.llm_latency)
+    with tempfile.TemporaryDirectory() as tmp:
+        output_csv = os.path.join(tmp, "responses.csv")
+        start = time.perf_counter()
+        response_gen.generate_csv_with_answers(args.test_csv, output_csv)
+        elapsed = time.perf_counter() - start
+    return {
+        "csv.rows_per_sec": metric(len(questions) / elapsed, "rows/s", "higher"),
+        "csv.total_s": metric(elapsed, "s"),
+    }
+
+
+def bench_turn(questions, args):
+    """Full voice turn (ASR finalization, retrieval + LLM, rephrase, TTS) with fake external services."""
+    from modules import response_gen, nlp_pipeline
+    response_gen.client = StubLLMClient(latency=args.llm_latency)
+    nlp_pipeline.interpret_command_with_api = stub_interpret_command(latency=args.llm_latency)
+    asr = FakeASR(latency=args.asr_latency)
+    tts = FakeTTS(latency=args.tts_latency)
+
+    stages = {"asr": [], "rag": [], "rephrase": [], "tts": [], "total": []}
+    context = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for i, question in enumerate(questions):
+            t0 = time.perf_counter()
+            text = asr.transcribe(question)
+            t1 = time.perf_counter()
+            data = response_gen.get_bot_response(text)
+            t2 = time.perf_counter()
+            system_out = nlp_pipeline.middleman(text, context, data)
+            t3 = time.perf_counter()
+            tts.save_audio_from_text(system_out, os.path.join(tmp, f"response_{i}.mp3"), i)
+            t4 = time.perf_counter()
+            context.append({"user": text, "assistant": system_out})
+            for name, value in zip(stages, (t1 - t0, t2 - t1, t3 - t2, t4 - t3, t4 - t0)):
+                stages[name].append(value)
+
+    results = {}
+    for name, values in stages.items():
+        results[f"turn.{name}.p50_ms"] = metric(1000 * float(np.percentile(values, 50)), "ms")
+        results[f"turn.{name}.p95_ms"] = metric(1000 * float(np.percentile(values, 95)), "ms")
+    return results
+
+
+def run(args):
+    questions = load_questions(args.test_csv)
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "suites": args.suites,
+        },
+        "metrics": {},
+    }
+    bench_functions = {"encoder": bench_encoder, "faiss": bench_faiss, "csv": bench_csv, "turn": bench_turn}
+    for suite in args.suites:
+        print(f"Running {suite} benchmark...")
+        report["metrics"].update(bench_functions[suite](questions, args))
+
+    for name, result in report["metrics"].items():
+        print(f"  {name:<40} {result['value']:12.3f} {result['unit']}")
+    with open(args.output_json, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {args.output_json}")
+
+
+def compare(args):
+    """Flag metrics that got worse by more than the threshold between two runs."""
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)["metrics"]
+    with open(args.candidate, encoding="utf-8") as f:
+        candidate = json.load(f)["metrics"]
+
+    regressions = []
+    for name in sorted(set(baseline) & set(candidate)):
+        before, after = baseline[name]["value"], candidate[name]["value"]
+        if before == 0:
+            continue
+        change = (after - before) / abs(before)
+        worse = change > args.threshold if baseline[name]["better"] == "lower" else change < -args.threshold
+        flag = "REGRESSION" if worse else ""
+        print(f"{name:<40} {before:12.3f} -> {after:12.3f} ({change:+7.1%}) {flag}")
+        if worse:
+            regressions.append(name)
+
+    if regressions:
+        print(f"{len(regressions)} regression(s) above {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print("No regressions found.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproducible benchmarks for the CANA pipeline.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run benchmark suites and save the results as JSON.")
+    run_parser.add_argument("--suites", type=str, nargs="+", default=list(SUITES), choices=SUITES)
+    run_parser.add_argument("--test_csv", type=str, default="data/test.csv")
+    run_parser.add_argument("--output_json", type=str, default="bench_results.json")
+    run_parser.add_argument("--encoder_backend", type=str, default="torch")
+    run_parser.add_argument("--threads", type=int, default=None)
+    run_parser.add_argument("--batch_sizes", type=int, nargs="+", default=[1, 8, 64])
+    run_parser.add_argument("--repeats", type=int, default=5)
+    run_parser.add_argument("--faiss_sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    run_parser.add_argument("--faiss_queries", type=int, default=200)
+    run_parser.add_argument("--llm_latency", type=float, default=0.0, help="Seconds each stubbed LLM call sleeps.")
+    run_parser.add_argument("--asr_latency", type=float, default=0.0, help="Seconds the fake ASR takes to finalize.")
+    run_parser.add_argument("--tts_latency", type=float, default=0.0, help="Seconds each fake TTS call sleeps.")
+
+    compare_parser = subparsers.add_parser("compare", help="Compare two result files and flag regressions.")
+    compare_parser.add_argument("baseline", type=str)
+    compare_parser.add_argument("candidate", type=str)
+    compare_parser.add_argument("--threshold", type=float, default=0.10, help="Relative change counted as a regression.")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    else:
+        compare(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
 import click
 import speech_recognition as sr
 from asr import WhisperASR
-# from utils import log_conversation
+from modules.app_logging import configure_logging
+from modules.conversation_store import log_conversation
 import tempfile
 import os
 import time
@@ -76,7 +77,7 @@ def converse(audio_path, microphone):
         # log_conversation(audio_source, transcribe_result, rag_result)
 
         result = transcript
-        # log_conversation(audio_source, transcript, {})
+        log_conversation(audio_source, transcript, {})
 
         click.echo(click.style(json.dumps(result, indent=2, ensure_ascii=False), fg="green"))
     except Exception as e:
@@ -85,4 +86,5 @@ def converse(audio_path, microphone):
         click.echo(click.style(f"Error: Processing failed - {str(e)}", fg="red"))
 
 if __name__ == "__main__":
+    configure_logging()
     cli()
\ No newline at end of file
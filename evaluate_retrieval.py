@@ -0,0 +1,93 @@
+import argparse
+import json
+import os
+import re
+import time
+import pandas as pd
+
+# Retrieval is evaluated without calling the LLM, so a Groq key is not needed
+os.environ.setdefault("GROQ_API_KEY", "unused-for-retrieval-eval")
+from modules import response_gen
+from modules.context_packer import count_tokens
+from modules.reranker import rerank
+
+
+def load_labels(labels_csv):
+    """Questions with the regex patterns a relevant chunk must match (alternatives separated by '|')."""
+    df = pd.read_csv(labels_csv)
+    df.columns = [col.lower() for col in df.columns]
+    return [(str(row["questions"]), re.compile(str(row["relevant_patterns"]), re.IGNORECASE)) for _, row in df.iterrows()]
+
+
+def evaluate(labels, modes, ks, context_k=5):
+    """
+    hit-rate@k (any relevant chunk in the top k), mean latency and mean tokens of the chunks
+    sent to the LLM for each retrieval mode. "<mode>+rerank" re-ranks RERANK_CANDIDATES chunks of
+    <mode> with the cross-encoder and keeps RERANK_TOP_N, so its hit-rate is capped at that many chunks.
+    """
+    max_k = max(ks)
+    artifacts = response_gen.artifact_manager.current()
+    report = {}
+    for mode in modes:
+        base_mode, _, stage = mode.partition("+")
+        hits = {k: 0 for k in ks}
+        latencies = []
+        context_tokens = []
+        for question, pattern in labels:
+            start = time.perf_counter()
+            if stage == "rerank":
+                candidates = response_gen.retrieve_chunk_ids(question, max(max_k, response_gen.RERANK_CANDIDATES), mode=base_mode, artifacts=artifacts)
+                order = rerank(question, [artifacts.content_chunks[i] for i in candidates], response_gen.RERANK_TOP_N,
+                               time_cap_s=response_gen.RERANK_TIME_CAP_MS / 1000)
+                chunk_ids = [candidates[i] for i in order]
+                sent = chunk_ids
+            else:
+                chunk_ids = response_gen.retrieve_chunk_ids(question, max_k, mode=base_mode, artifacts=artifacts)
+                sent = chunk_ids[:context_k]
+            latencies.append(time.perf_counter() - start)
+            context_tokens.append(sum(count_tokens(artifacts.content_chunks[i]) for i in sent))
+            relevant = [bool(pattern.search(artifacts.content_chunks[i])) for i in chunk_ids]
+            for k in ks:
+                if any(relevant[:k]):
+                    hits[k] += 1
+        report[mode] = {
+            "hit_rate": {str(k): hits[k] / len(labels) for k in ks},
+            "mean_latency_ms": 1000 * sum(latencies) / len(latencies),
+            "mean_context_tokens": sum(context_tokens) / len(context_tokens),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report retrieval hit-rate@k for dense, sparse and hybrid retrieval.")
+    parser.add_argument("--labels_csv", type=str, default="data/retrieval_labels.csv", help="CSV with 'questions' and 'relevant_patterns' columns.")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5, 10], help="Cut-offs to report hit-rate at.")
+    parser.add_argument("--modes", type=str, nargs="+", default=["dense", "sparse", "hybrid"], help="Retrieval modes to compare.")
+    parser.add_argument("--rerank", action="store_true", help="Also evaluate every mode followed by cross-encoder re-ranking.")
+    parser.add_argument("--context_k", type=int, default=5, help="Chunks sent to the LLM without re-ranking (for the token column).")
+    parser.add_argument("--output_json", type=str, default=None, help="Optional path to save the report as JSON.")
+    args = parser.parse_args()
+
+    if not response_gen.rag_artifacts_loaded:
+        print("Error: RAG components are not loaded. Cannot evaluate retrieval.")
+        return
+
+    labels = load_labels(args.labels_csv)
+    print(f"Evaluating {len(labels)} labelled questions from {args.labels_csv}...")
+    modes = args.modes + ([f"{mode}+rerank" for mode in args.modes] if args.rerank else [])
+    report = evaluate(labels, modes, args.k, args.context_k)
+
+    header = f"{'mode':<15}" + "".join(f"{'hit@' + str(k):>9}" for k in args.k) + f"{'latency':>12}{'tokens':>9}"
+    print(header)
+    for mode, result in report.items():
+        row = f"{mode:<15}" + "".join(f"{result['hit_rate'][str(k)]:>9.3f}" for k in args.k)
+        print(row + f"{result['mean_latency_ms']:>10.1f}ms{result['mean_context_tokens']:>9.0f}")
+
+    if args.output_json:
+        with open(args.output_json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to {args.output_json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import argparse
+import json
+import time
+import pandas as pd
+from modules.intent_recognition import detect_intents, classify_queries, load_transcript, get_user_queries
+from modules.embedding_store import query_embedding_cache
+from modules.model_registry import registry
+from modules.sentiment_head import SENTIMENT_HEAD_PATH
+
+
+def load_queries(path):
+    """Queries (and gold sentiments, if the CSV has a 'sentiment' column) from a CSV or transcript JSON."""
+    if path.endswith(".csv"):
+        df = pd.read_csv(path)
+        df.columns = [col.lower() for col in df.columns]
+        df = df[df["questions"].astype(str).str.strip() != ""]
+        gold = [str(s).upper() for s in df["sentiment"]] if "sentiment" in df.columns else None
+        return [str(q) for q in df["questions"]], gold
+    return get_user_queries(load_transcript(path)), None
+
+
+def run_baseline(queries):
+    """The original pipeline: zero-shot intents, then a separate sentiment model pass, one query at a time."""
+    start = time.perf_counter()
+    results = []
+    for query in queries:
+        intents, _ = detect_intents(query)
+        sentiment = registry.get("sentiment")(query)[0]
+        results.append((intents, sentiment["label"].upper()))
+    return results, time.perf_counter() - start
+
+
+def evaluate(queries, modes, gold=None):
+    # Load every model up front so load time is not counted as latency
+    registry.get("zero_shot")
+    registry.get("sentiment")
+    baseline, baseline_seconds = run_baseline(queries)
+    report = {"baseline": {"mean_latency_ms": 1000 * baseline_seconds / len(queries)}}
+    if gold:
+        report["baseline"]["sentiment_accuracy"] = sum(s == g for (_, s), g in zip(baseline, gold)) / len(queries)
+
+    runs = [(mode, mode) for mode in modes]
+    if "head" in modes:
+        # "head" starts from an empty embedding cache, so it pays for encoding the queries;
+        # "head_warm" reruns it once the queries are embedded, as when retrieval ran first
+        runs.insert(runs.index(("head", "head")) + 1, ("head_warm", "head"))
+
+    for name, mode in runs:
+        if name == "head":
+            query_embedding_cache.clear()
+        start = time.perf_counter()
+        classified = classify_queries(queries, mode=mode)
+        elapsed = time.perf_counter() - start
+        result = {
+            "mean_latency_ms": 1000 * elapsed / len(queries),
+            "sentiment_agreement": sum(c[2] == b[1] for c, b in zip(classified, baseline)) / len(queries),
+            "intent_agreement": sum(c[0] == b[0] for c, b in zip(classified, baseline)) / len(queries),
+        }
+        if gold:
+            result["sentiment_accuracy"] = sum(c[2] == g for c, g in zip(classified, gold)) / len(queries)
+        report[name] = result
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare combined intent/sentiment classification against the two-model pipeline.")
+    parser.add_argument("--input", type=str, default="data/test.csv", help="CSV with a 'questions' (and optional 'sentiment') column, or a transcript JSON.")
+    parser.add_argument("--modes", type=str, nargs="+", default=None, help="Sentiment modes to compare (default: zero_shot, model and head if trained).")
+    parser.add_argument("--output_json", type=str, default=None, help="Optional path to save the report as JSON.")
+    args = parser.parse_args()
+
+    modes = args.modes or ["zero_shot", "model"] + (["head"] if SENTIMENT_HEAD_PATH.exists() else [])
+    queries, gold = load_queries(args.input)
+    print(f"Classifying {len(queries)} queries from {args.input}...")
+    report = evaluate(queries, modes, gold)
+
+    print(f"{'mode':<11}{'latency':>12}{'sentiment agree':>17}{'intent agree':>14}" + (f"{'accuracy':>10}" if gold else ""))
+    for mode in ["baseline"] + [name for name in report if name != "baseline"]:
+        result = report[mode]
+        row = f"{mode:<11}{result['mean_latency_ms']:>10.1f}ms"
+        row += f"{result.get('sentiment_agreement', 1.0):>17.3f}{result.get('intent_agreement', 1.0):>14.3f}"
+        if gold:
+            row += f"{result['sentiment_accuracy']:>10.3f}"
+        print(row)
+    if "head" in report:
+        print("(head includes encoding the queries; head_warm reuses embeddings already computed for retrieval)")
+
+    if args.output_json:
+        with open(args.output_json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to {args.output_json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,68 +1,88 @@
 import tkinter as tk
+from modules.app_logging import configure_logging
+# Configured before the other modules are imported so their start-up messages are kept
+configure_logging()
+import logging
 from modules.ui import TranscriptionApp
-from modules.response_gen import get_bot_response
-from modules.nlp_pipeline import middleman
-from modules.tts import save_audio_from_text
+from modules.response_gen import start_artifact_watcher
+from modules.tts import cached_clip
+from modules.deadline import FILLER_TEXT
+from modules.model_registry import registry as model_registry
+from modules.conversation_store import get_store
+from modules.voice_session import VoiceSession
 import os
-import pygame
+import sqlite3
 import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
 
 # Global variables to store user input and language
 user_input = ""
 language = "en-US"
-data = ""
-context = []
-system_out = ""
+# The turn pipeline (speculative retrieval, RAG, rephrase, conversation store, TTS) is shared
+# with the replay harness, see modules/voice_session.py
+session = VoiceSession()
+
+def handle_partial_transcript(hypothesis, stable):
+    """Schedule speculative retrieval for a partial transcript"""
+    session.observe_partial(hypothesis, stable)
 
-def update_user_data(text, lang):
-    """Update global variables with user input and language"""
-    global user_input, language, data, system_out, context
+def update_user_data(text, lang, turn_id=None, is_current=None):
+    """Update global variables with user input and language, and return the system output
+    together with the turn's Deadline, which the UI hands to synthesize_tts_audio with it.
+    Runs on a worker thread, never on the Tk main loop. `is_current()` tells whether the user
+    has barged in since (see VoiceSession.respond)."""
+    global user_input, language
     user_input = text
     language = lang
     
     # Get RAG data using the user input
     if user_input:
-        data = get_bot_response(user_input)
-        # Call middleman function with user_input, context, and data
-        system_out = middleman(user_input, context, data)
-        # Print the system output to console
-        print(f"System Output: {system_out}")
-        
-        # Add user input and system output to context
-        context.append({"user": user_input, "assistant": system_out})
+        result = session.respond(text, lang, turn_id=turn_id, is_current=is_current)
+        return result.response, result.deadline
+    return None
 
-def play_tts_audio(text):
-    """Play TTS audio for the given text"""
-    # Speak out the system output using TTS
+def synthesize_tts_audio(text, deadline=None):
+    """Render TTS audio for the given text to a temporary MP3 and return its path.
+    Playback (and deleting the file afterwards) is left to the UI so it never blocks.
+    TTS gets what is left of the turn's `deadline`; if it fails, the cached filler clip is played."""
     with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as temp_file:
         temp_filename = temp_file.name
     
-    save_audio_from_text(text, temp_filename, 0)
-    
-    # Play the audio
-    pygame.mixer.init()
-    pygame.mixer.music.load(temp_filename)
-    pygame.mixer.music.play()
-    
-    # Wait for playback to finish, then clean up
-    while pygame.mixer.music.get_busy():
-        pygame.time.wait(100)
-    
-    os.unlink(temp_filename)
+    if not session.synthesize(text, temp_filename, deadline):
+        os.unlink(temp_filename)
+        raise RuntimeError("TTS synthesis failed")
+    return temp_filename
 
 def get_system_response():
     """Return the current system output"""
-    return system_out
+    return session.last_response
 
 def main():
     """Main function to start the transcription app"""
+    # Pick up newly published RAG artifact versions without restarting the app
+    start_artifact_watcher(float(os.getenv("RAG_RELOAD_INTERVAL", "10")))
+    # Open the conversation store before the first turn; a bad CONVERSATION_DB stops the app here
+    try:
+        get_store()
+    except (OSError, sqlite3.Error) as e:
+        logger.error("Could not open the conversation store: %s", e)
+        raise SystemExit(1)
+    logger.info("Starting voice session %s", session.session_id)
+    # Free the intent / sentiment models when they have not been used for MODEL_IDLE_TIMEOUT seconds
+    model_registry.start_reaper()
+    # Render the filler clip ahead of the first turn that needs it
+    threading.Thread(target=cached_clip, args=(FILLER_TEXT,), daemon=True, name="filler-clip").start()
+
     root = tk.Tk()
     app = TranscriptionApp(root)
     
     # Store reference to update function for potential future use
     app.update_user_data = update_user_data
     app.get_system_response = get_system_response
-    app.play_audio_callback = play_tts_audio
+    app.synthesize_audio_callback = synthesize_tts_audio
+    app.on_partial_transcript = handle_partial_transcript
     
     root.mainloop()
 
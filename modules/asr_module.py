@@ -5,30 +5,51 @@ from amazon_transcribe.handlers import TranscriptResultStreamHandler
 from amazon_transcribe.model import TranscriptEvent
 
 class MyEventHandler(TranscriptResultStreamHandler):
-    def __init__(self, stream, transcript_store, text_widget=None):
+    def __init__(self, stream, transcript_store, text_widget=None, on_partial=None):
         super().__init__(stream)
         self.transcript_store = transcript_store
         self.text_widget = text_widget  # Optional: used in GUI
+        self.on_partial = on_partial  # Optional: called with (hypothesis, stable) for every partial result
 
     async def handle_transcript_event(self, transcript_event: TranscriptEvent):
         for result in transcript_event.transcript.results:
-            if not result.is_partial:
-                text = result.alternatives[0].transcript
+            if not result.alternatives:
+                continue
+            alternative = result.alternatives[0]
+            text = alternative.transcript
+            if result.is_partial:
+                # Hypothesis for the whole utterance: finalized segments plus the running partial
+                hypothesis = self.transcript_store["final"] + text
+                self.transcript_store["partial"] = hypothesis
+                if self.on_partial:
+                    items = alternative.items or []
+                    stable = bool(items) and all(getattr(item, "stable", False) for item in items)
+                    self.on_partial(hypothesis, stable)
+            else:
                 self.transcript_store["final"] += text + " "
+                self.transcript_store["partial"] = self.transcript_store["final"]
+                if self.on_partial:
+                    self.on_partial(self.transcript_store["final"], True)
                 if self.text_widget:
                     # Update GUI text area from main thread
                     self.text_widget.after(0, lambda: self.text_widget.insert("end", text + "\n"))
 
-async def stream_audio_to_transcribe(stop_event: asyncio.Event, transcript_store, text_widget=None, lang_code="en-US"):
+async def stream_audio_to_transcribe(stop_event: asyncio.Event, transcript_store, text_widget=None, lang_code="en-US", on_partial=None):
     client = TranscribeStreamingClient(region="us-west-2")
 
     stream = await client.start_stream_transcription(
         language_code=lang_code,
         media_sample_rate_hz=16000,
         media_encoding="pcm",
+        # Lets the service mark words that will not change any more, so partials
+        # can be acted on before the utterance ends
+        enable_partial_results_stabilization=True,
+        partial_results_stability="high",
     )
 
-    handler = MyEventHandler(stream.output_stream, transcript_store, text_widget)
+    transcript_store.setdefault("final", "")
+    transcript_store.setdefault("partial", "")
+    handler = MyEventHandler(stream.output_stream, transcript_store, text_widget, on_partial)
 
     audio = pyaudio.PyAudio()
     mic_stream = audio.open(
@@ -0,0 +1,118 @@
+import logging
+import re
+import zlib
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception as e:
+    logger.warning("tiktoken unavailable (%s); falling back to approximate token counts.", e)
+    _encoding = None
+
+# "--- Page 3 of RBI Document.pdf ---" markers added by extract_text_from_pdf; the chunker
+# stored some of the surrounding newlines as literal "\n" escapes.
+_PAGE_MARKER_RE = re.compile(r"(?:\\n)*\s*--- Page \d+ of [^\n]*? ---\s*(?:\\n)*")
+_BOILERPLATE_LINE_RES = [
+    re.compile(r"^\s*Peer-to-Peer Lending \| Monthly Platform Performance Factsheet\s*$", re.IGNORECASE),
+    re.compile(r"^\s*Page \d+ of \d+\s*$", re.IGNORECASE),
+    re.compile(r"^\s*LenDenClub; All rights reserved\s*$", re.IGNORECASE),
+]
+_SHINGLE_SIZE = 3
+_NUM_PERMUTATIONS = 64
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, 1 << 31, size=_NUM_PERMUTATIONS).astype(np.uint64)
+_PERM_B = _rng.randint(0, 1 << 31, size=_NUM_PERMUTATIONS).astype(np.uint64)
+
+
+def count_tokens(text):
+    """Token count of `text` (cl100k BPE when available, otherwise ~4 characters per token)."""
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def truncate_to_tokens(text, max_tokens):
+    if _encoding is not None:
+        return _encoding.decode(_encoding.encode(text)[:max_tokens])
+    return text[:max_tokens * 4]
+
+
+def strip_boilerplate(chunk):
+    """Remove page markers, repeated factsheet headers/footers and redundant whitespace."""
+    text = _PAGE_MARKER_RE.sub("\n", chunk).replace("\\n", "\n").replace("\xa0", " ").replace("\u200b", "")
+    lines = [line.strip() for line in text.splitlines()]
+    lines = [line for line in lines if line and not any(pattern.match(line) for pattern in _BOILERPLATE_LINE_RES)]
+    return "\n".join(lines)
+
+
+def minhash_signature(text):
+    """MinHash signature over word 3-gram shingles."""
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < _SHINGLE_SIZE:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {" ".join(words[i:i + _SHINGLE_SIZE]) for i in range(len(words) - _SHINGLE_SIZE + 1)}
+    hashes = np.array([zlib.crc32(shingle.encode("utf-8")) for shingle in shingles], dtype=np.uint64)
+    permuted = (np.outer(hashes, _PERM_A) + _PERM_B) % _MERSENNE_PRIME
+    return permuted.min(axis=0)
+
+
+def estimated_jaccard(signature_a, signature_b):
+    return float(np.mean(signature_a == signature_b))
+
+
+def pack_context(chunks, token_budget, dedup_threshold=0.8):
+    """
+    Pack retrieved chunks (already ordered by relevance, best first) into a prompt context.
+
+    Boilerplate is stripped, chunks whose estimated Jaccard similarity to an already
+    kept chunk is at least `dedup_threshold` are dropped, and chunks are added in
+    relevance order until `token_budget` is reached (the last one may be truncated).
+
+    Returns the packed context and a dict of token statistics for the query.
+    """
+    original_tokens = count_tokens(" ".join(chunks))
+    kept_texts = []
+    kept_signatures = []
+    duplicates = 0
+    used_tokens = 0
+    truncated = False
+
+    for chunk in chunks:
+        text = strip_boilerplate(chunk)
+        if not text:
+            continue
+        signature = minhash_signature(text)
+        if any(estimated_jaccard(signature, other) >= dedup_threshold for other in kept_signatures):
+            duplicates += 1
+            continue
+
+        tokens = count_tokens(text)
+        remaining = token_budget - used_tokens
+        if tokens > remaining:
+            # Only worth including a partial chunk if a meaningful part of it fits
+            if remaining >= 32:
+                kept_texts.append(truncate_to_tokens(text, remaining))
+                used_tokens += remaining
+            truncated = True
+            break
+        kept_texts.append(text)
+        kept_signatures.append(signature)
+        used_tokens += tokens
+
+    packed = "\n\n".join(kept_texts)
+    packed_tokens = count_tokens(packed)
+    stats = {
+        "original_tokens": original_tokens,
+        "packed_tokens": packed_tokens,
+        "saved_tokens": max(original_tokens - packed_tokens, 0),
+        "chunks_in": len(chunks),
+        "chunks_kept": len(kept_texts),
+        "duplicates_dropped": duplicates,
+        "truncated": truncated,
+    }
+    return packed, stats
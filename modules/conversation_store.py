@@ -0,0 +1,180 @@
+import argparse
+import atexit
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+CONVERSATION_DB = os.getenv("CONVERSATION_DB", "output/conversations.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    language TEXT,
+    user_text TEXT,
+    response TEXT,
+    metadata TEXT
+);
+CREATE INDEX IF NOT EXISTS turns_session ON turns (session_id, id);
+"""
+
+
+def new_session_id():
+    return time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:8]
+
+
+class ConversationStore:
+    """
+    Append-only store of conversation turns in SQLite (WAL mode).
+
+    `log_turn` only enqueues the turn; a background thread owns the write connection
+    and commits whatever has queued up in one transaction, so a voice turn never
+    waits on the disk. Reads use their own connection and do not block the writer.
+    """
+
+    def __init__(self, path=CONVERSATION_DB, open_timeout=10.0):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._queue = queue.SimpleQueue()
+        self._writer = threading.Thread(target=self._write_loop, daemon=True, name="conversation-store")
+        self._ready = threading.Event()
+        self._open_error = None
+        self._writer.start()
+        if not self._ready.wait(open_timeout):
+            raise TimeoutError(f"Timed out opening the conversation store at {path}")
+        if self._open_error is not None:
+            raise self._open_error
+
+    def log_turn(self, session_id, user_text, response, language=None, **metadata):
+        self._queue.put((session_id, time.time(), language, user_text, response, json.dumps(metadata, ensure_ascii=False, default=str)))
+
+    def flush(self, timeout=5.0):
+        """Wait until every turn logged so far is committed."""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        self._queue.put(None)
+        self._writer.join(timeout)
+
+    def _write_loop(self):
+        try:
+            connection = sqlite3.connect(self.path)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(_SCHEMA)
+        except sqlite3.Error as e:
+            # Handed back to __init__, which would otherwise wait for a writer that is gone
+            self._open_error = e
+            self._ready.set()
+            return
+        self._ready.set()
+        running = True
+        while running:
+            items = [self._queue.get()]
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            rows = [item for item in items if isinstance(item, tuple)]
+            if rows:
+                try:
+                    with connection:
+                        connection.executemany(
+                            "INSERT INTO turns (session_id, created_at, language, user_text, response, metadata) VALUES (?, ?, ?, ?, ?, ?)", rows)
+                except sqlite3.Error as e:
+                    logger.error("Could not store %d conversation turns: %s", len(rows), e)
+            for item in items:
+                if isinstance(item, threading.Event):
+                    item.set()
+                elif item is None:
+                    running = False
+        connection.close()
+
+    def _read(self, sql, params=()):
+        connection = sqlite3.connect(self.path)
+        connection.row_factory = sqlite3.Row
+        try:
+            return [dict(row) for row in connection.execute(sql, params)]
+        finally:
+            connection.close()
+
+    def sessions(self):
+        """(session id, number of turns, first and last timestamp) for every stored session, newest first."""
+        return self._read("SELECT session_id, COUNT(*) AS turns, MIN(created_at) AS started_at, MAX(created_at) AS ended_at "
+                          "FROM turns GROUP BY session_id ORDER BY started_at DESC")
+
+    def load_session(self, session_id):
+        turns = self._read("SELECT * FROM turns WHERE session_id = ? ORDER BY id", (session_id,))
+        for turn in turns:
+            turn["metadata"] = json.loads(turn["metadata"]) if turn["metadata"] else {}
+        return turns
+
+    def export_transcript(self, session_id, output_path):
+        """
+        Write a session in the transcript format read by intent_recognition.load_transcript.
+        Responses of turns the user barged in on were never played, so only their question is kept.
+        """
+        segments = []
+        for turn in self.load_session(session_id):
+            segments.append({"speaker_id": "speaker_1", "text": turn["user_text"] or "", "language": turn["language"]})
+            if not turn["metadata"].get("superseded"):
+                segments.append({"speaker_id": "speaker_0", "text": turn["response"] or ""})
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump({"session_id": session_id, "segments": segments}, f, indent=2, ensure_ascii=False)
+        return sum(segment["speaker_id"] == "speaker_1" for segment in segments)
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_store():
+    """The process-wide store at CONVERSATION_DB, opened on first use."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = ConversationStore()
+            # Commit whatever is still queued when the process exits
+            atexit.register(_default_store.close)
+        return _default_store
+
+
+def log_conversation(audio_source, transcript, result, session_id=None):
+    """Store one CLI exchange: the ASR transcript dict and the processing result."""
+    get_store().log_turn(session_id or f"cli-{audio_source}", transcript.get("text", ""), result.get("response"),
+                         language=transcript.get("language"), audio_source=audio_source, **{k: v for k, v in result.items() if k != "response"})
+
+
+if __name__ == "__main__":
+    # List stored sessions, or export one for replay:
+    #   python -m modules.conversation_store list
+    #   python -m modules.conversation_store export <session_id> transcript.json
+    parser = argparse.ArgumentParser(description="Inspect the stored conversations.")
+    parser.add_argument("--db", type=str, default=CONVERSATION_DB)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list", help="List stored sessions.")
+    export_parser = subparsers.add_parser("export", help="Export a session as transcript JSON.")
+    export_parser.add_argument("session_id", type=str)
+    export_parser.add_argument("output_path", type=str)
+    args = parser.parse_args()
+
+    store = ConversationStore(args.db)
+    if args.command == "list":
+        for session in store.sessions():
+            started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(session["started_at"]))
+            print(f"{session['session_id']:<32}{session['turns']:>6} turns  started {started}")
+    else:
+        exported = store.export_transcript(args.session_id, args.output_path)
+        print(f"Exported {exported} turns of {args.session_id} to {args.output_path}")
+    store.close()
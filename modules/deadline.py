@@ -0,0 +1,70 @@
+import os
+import time
+from modules import metrics
+
+# Time budget of a voice turn, from the final transcript to the reply audio being ready
+TURN_SLO_SECONDS = float(os.getenv("TURN_SLO_SECONDS", "4.0"))
+# Time kept back for text-to-speech when the LLM calls are given their timeouts
+TTS_RESERVE_SECONDS = float(os.getenv("TTS_RESERVE_SECONDS", "1.0"))
+# The middleman rephrase is skipped when less than this is left before the TTS reserve
+REPHRASE_MIN_SECONDS = float(os.getenv("REPHRASE_MIN_SECONDS", "0.8"))
+# Retrieval stops waiting on slow lookups when less than this (plus the TTS reserve) would be left for the LLM
+LLM_MIN_SECONDS = float(os.getenv("LLM_MIN_SECONDS", "1.0"))
+# No request is given a timeout shorter than this, even once the budget is spent
+MIN_TIMEOUT_SECONDS = 0.5
+
+# Spoken when neither the LLM, the answer cache nor the FAQ produced an answer in time
+FILLER_TEXT = "Sorry, that is taking a little longer than usual. Could you please ask me again?"
+
+
+class Deadline:
+    """
+    Time budget of one voice turn, passed down to every stage that may block.
+
+    Stages size their request timeouts from `timeout()`, call `fallback()` when they
+    degrade, and `check()` when they finish; `finish()` records whether the turn met
+    its budget and, if not, the stage that used it up.
+    """
+
+    def __init__(self, budget_s=TURN_SLO_SECONDS):
+        self.budget_s = budget_s
+        self.start = time.monotonic()
+        self.expires_at = self.start + budget_s
+        self.missed_in = None
+        self.fallbacks = []
+
+    def elapsed(self):
+        return time.monotonic() - self.start
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+    def can_afford(self, seconds, reserve=0.0):
+        return self.remaining() - reserve >= seconds
+
+    def budget(self, reserve=0.0):
+        """Seconds a stage may still take while leaving `reserve` for the stages after it; <= 0 when none."""
+        return self.remaining() - reserve
+
+    def timeout(self, reserve=0.0):
+        """Timeout for a request that must leave `reserve` seconds for the stages after it."""
+        return max(MIN_TIMEOUT_SECONDS, self.remaining() - reserve)
+
+    def check(self, stage):
+        """Call when `stage` completes; the first stage to finish past the deadline is blamed for the miss."""
+        if self.missed_in is None and self.expired():
+            self.missed_in = stage
+
+    def fallback(self, kind):
+        self.fallbacks.append(kind)
+        metrics.increment(f"slo.fallback.{kind}")
+
+    def finish(self):
+        metrics.increment("slo.turns")
+        metrics.observe("slo.turn_seconds", self.elapsed())
+        if self.missed_in is not None:
+            metrics.increment("slo.misses")
+            metrics.increment(f"slo.miss.{self.missed_in}")
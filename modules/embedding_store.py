@@ -0,0 +1,198 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+import numpy as np
+
+EMBEDDINGS_FILE = "rag_chunk_embeddings.f16"
+EMBEDDINGS_META_FILE = "rag_chunk_embeddings.json"
+
+
+def chunks_fingerprint(chunks):
+    """SHA-1 over the chunk texts, used to check the embeddings are aligned with the chunk list."""
+    digest = hashlib.sha1()
+    for chunk in chunks:
+        digest.update(chunk.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ChunkEmbeddingStore:
+    """
+    Chunk embeddings persisted as a float16 matrix, memory-mapped read-only.
+    Row i is the embedding of content chunk i, so index rebuilds, re-ranking or
+    MMR experiments never need to re-embed the corpus.
+    """
+
+    def __init__(self, matrix, meta):
+        self.matrix = matrix
+        self.meta = meta
+
+    @property
+    def model_id(self):
+        return self.meta["model_id"]
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    @classmethod
+    def from_embeddings(cls, embeddings, model_id, chunks):
+        """An in-memory store of the embeddings (n, dim) for `chunks`, in the same float16 form as a saved one."""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if embeddings.shape[0] != len(chunks):
+            raise ValueError(f"Got {embeddings.shape[0]} embeddings for {len(chunks)} chunks.")
+        meta = {
+            "model_id": model_id,
+            "count": int(embeddings.shape[0]),
+            "dim": int(embeddings.shape[1]),
+            "dtype": "float16",
+            "chunks_sha1": chunks_fingerprint(chunks),
+        }
+        return cls(embeddings.astype(np.float16), meta)
+
+    @classmethod
+    def save(cls, cache_dir, embeddings, model_id, chunks):
+        """
+        Write the embeddings (n, dim) for `chunks` and return the memory-mapped store.
+        Both files are written under temporary names and renamed into place, so a process
+        that has the previous files memory-mapped keeps reading them intact.
+        """
+        cache_dir = Path(cache_dir)
+        store = cls.from_embeddings(embeddings, model_id, chunks)
+        matrix_tmp = cache_dir / f".{EMBEDDINGS_FILE}.tmp"
+        meta_tmp = cache_dir / f".{EMBEDDINGS_META_FILE}.tmp"
+        store.matrix.tofile(matrix_tmp)
+        with open(meta_tmp, "w", encoding="utf-8") as f:
+            json.dump(store.meta, f, indent=2)
+        os.replace(matrix_tmp, cache_dir / EMBEDDINGS_FILE)
+        os.replace(meta_tmp, cache_dir / EMBEDDINGS_META_FILE)
+        return cls.load(cache_dir)
+
+    @classmethod
+    def load(cls, cache_dir):
+        cache_dir = Path(cache_dir)
+        with open(cache_dir / EMBEDDINGS_META_FILE, encoding="utf-8") as f:
+            meta = json.load(f)
+        matrix = np.memmap(cache_dir / EMBEDDINGS_FILE, dtype=np.float16, mode="r", shape=(meta["count"], meta["dim"]))
+        return cls(matrix, meta)
+
+    @classmethod
+    def exists(cls, cache_dir):
+        cache_dir = Path(cache_dir)
+        return (cache_dir / EMBEDDINGS_FILE).exists() and (cache_dir / EMBEDDINGS_META_FILE).exists()
+
+    def matches(self, chunks):
+        return self.meta["count"] == len(chunks) and self.meta["chunks_sha1"] == chunks_fingerprint(chunks)
+
+    def get(self, ids):
+        """float32 embeddings of the given chunk ids."""
+        return np.asarray(self.matrix[np.asarray(ids)], dtype=np.float32)
+
+    def build_faiss_index(self, kind="flat_l2", hnsw_m=32):
+        """Build a new FAISS index from the stored embeddings, without running the encoder."""
+        import faiss
+        vectors = np.asarray(self.matrix, dtype=np.float32)
+        dim = vectors.shape[1]
+        if kind == "flat_l2":
+            index = faiss.IndexFlatL2(dim)
+        elif kind == "flat_ip":
+            vectors = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-9, None)
+            index = faiss.IndexFlatIP(dim)
+        elif kind == "hnsw":
+            index = faiss.IndexHNSWFlat(dim, hnsw_m)
+        else:
+            raise ValueError(f"Unknown index kind '{kind}'. Choose flat_l2, flat_ip or hnsw.")
+        index.add(vectors)
+        return index
+
+
+def embeddings_from_faiss_index(index):
+    """Recover the stored vectors of a flat FAISS index (e.g. to seed the store for an existing cache)."""
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def normalize_query_text(text):
+    return " ".join(text.lower().split())
+
+
+class QueryEmbeddingCache:
+    """Thread-safe LRU cache of query embeddings keyed by (model id, normalized query text or an explicit key)."""
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, model_id, text, compute_fn, key=None):
+        """
+        Return the cached embedding of `text`, calling `compute_fn(text)` only on a miss.
+        Queries passed the same `key` (e.g. query_normalizer.cache_key) share one entry.
+        """
+        key = (model_id, key if key is not None else normalize_query_text(text))
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return embedding
+            self.misses += 1
+        embedding = compute_fn(text)
+        with self._lock:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return embedding
+
+    def get_or_compute_many(self, model_id, texts, compute_fn, keys=None):
+        """Embeddings of `texts` as one (n, dim) array; the misses are passed to `compute_fn` in a single batch."""
+        keys = [(model_id, key if key is not None else normalize_query_text(text))
+                for text, key in zip(texts, keys or [None] * len(texts))]
+        with self._lock:
+            embeddings = [self._entries.get(key) for key in keys]
+            for key, embedding in zip(keys, embeddings):
+                if embedding is not None:
+                    self._entries.move_to_end(key)
+            missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+        if missing:
+            computed = compute_fn([texts[i] for i in missing])
+            with self._lock:
+                for i, embedding in zip(missing, computed):
+                    # Stored in the (1, dim) shape get_or_compute returns
+                    embeddings[i] = self._entries[keys[i]] = embedding[None, :]
+                    self._entries.move_to_end(keys[i])
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return np.concatenate(embeddings, axis=0)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Shared by retrieval and the sentiment head, so a query embedded for one is reused by the other
+query_embedding_cache = QueryEmbeddingCache(maxsize=4096)
+
+
+if __name__ == "__main__":
+    # Rebuild the FAISS index from the stored embeddings (no encoder needed):
+    #   python -m modules.embedding_store --kind hnsw --output ./rag_cache/rag_faiss_hnsw.index
+    import faiss
+
+    parser = argparse.ArgumentParser(description="Rebuild a FAISS index from the persisted chunk embeddings.")
+    parser.add_argument("--cache_dir", type=str, default="./rag_cache")
+    parser.add_argument("--kind", type=str, default="flat_l2", choices=["flat_l2", "flat_ip", "hnsw"])
+    parser.add_argument("--output", type=str, required=True, help="Path of the FAISS index to write.")
+    args = parser.parse_args()
+
+    store = ChunkEmbeddingStore.load(args.cache_dir)
+    index = store.build_faiss_index(args.kind)
+    faiss.write_index(index, args.output)
+    print(f"Built {args.kind} index with {index.ntotal} vectors from {args.cache_dir} at {args.output}")
@@ -0,0 +1,196 @@
+import argparse
+import logging
+import os
+import time
+from pathlib import Path
+import numpy as np
+import torch
+from transformers import AutoTokenizer, AutoModel
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = "sentence-transformers/all-mpnet-base-v2"
+BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+ONNX_CACHE_DIR = Path("./rag_cache/onnx")
+
+
+def mean_pool(last_hidden_state, attention_mask):
+    """Mean of the token embeddings, ignoring padding positions."""
+    mask = attention_mask[..., None].astype(last_hidden_state.dtype)
+    return (last_hidden_state * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+
+class _LastHiddenState(torch.nn.Module):
+    """Wraps the HF model so the ONNX graph has plain tensor inputs and a single output."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+
+
+class QueryEncoder:
+    """
+    Sentence encoder with interchangeable inference backends:
+
+    - "torch":      fp32 PyTorch (the original behaviour)
+    - "torch-int8": PyTorch with dynamic int8 quantization of the Linear layers
+    - "onnx":       ONNX Runtime on an exported fp32 graph
+    - "onnx-int8":  ONNX Runtime on a dynamically int8-quantized graph
+
+    `num_threads` sets torch intra-op threads (and the ONNX Runtime equivalent);
+    None keeps the library defaults.
+    """
+
+    def __init__(self, model_name=MODEL_NAME, backend="torch", num_threads=None, max_length=512):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown encoder backend '{backend}'. Choose one of {', '.join(BACKENDS)}.")
+        self.model_name = model_name
+        self.backend = backend
+        self.num_threads = num_threads
+        self.max_length = max_length
+        if num_threads:
+            torch.set_num_threads(num_threads)
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModel.from_pretrained(model_name)
+        model.eval()
+        self.hidden_size = model.config.hidden_size
+        self.model = None
+        self.session = None
+        self._inherited_sessions = []
+
+        if backend == "torch":
+            self.model = model
+        elif backend == "torch-int8":
+            self.model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        else:
+            self.session = self._load_onnx_session(model, quantized=backend == "onnx-int8")
+
+    def _load_onnx_session(self, model, quantized):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("The ONNX encoder backends need onnxruntime: pip install onnxruntime") from e
+
+        ONNX_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        base_name = self.model_name.replace("/", "__")
+        onnx_path = ONNX_CACHE_DIR / f"{base_name}.onnx"
+        if not onnx_path.exists():
+            logger.info("Exporting %s to ONNX at %s...", self.model_name, onnx_path)
+            dummy = self.tokenizer(["export"], return_tensors="pt")
+            torch.onnx.export(
+                _LastHiddenState(model),
+                (dummy["input_ids"], dummy["attention_mask"]),
+                str(onnx_path),
+                input_names=["input_ids", "attention_mask"],
+                output_names=["last_hidden_state"],
+                dynamic_axes={
+                    "input_ids": {0: "batch", 1: "sequence"},
+                    "attention_mask": {0: "batch", 1: "sequence"},
+                    "last_hidden_state": {0: "batch", 1: "sequence"},
+                },
+                opset_version=14,
+            )
+        if quantized:
+            quantized_path = ONNX_CACHE_DIR / f"{base_name}.int8.onnx"
+            if not quantized_path.exists():
+                from onnxruntime.quantization import quantize_dynamic, QuantType
+                logger.info("Quantizing ONNX graph to int8 at %s...", quantized_path)
+                quantize_dynamic(str(onnx_path), str(quantized_path), weight_type=QuantType.QInt8)
+            onnx_path = quantized_path
+
+        options = ort.SessionOptions()
+        if self.num_threads:
+            options.intra_op_num_threads = self.num_threads
+        return ort.InferenceSession(str(onnx_path), options, providers=["CPUExecutionProvider"])
+
+    def reopen_onnx_session(self, num_threads=None):
+        """
+        Open a fresh ONNX Runtime session on the cached graph. Needed in a forked worker:
+        a session created before fork() has no thread pool in the child.
+        """
+        if self.session is None:
+            return
+        # The inherited session stays referenced; destroying it would join threads that only exist in the parent
+        self._inherited_sessions.append(self.session)
+        self.num_threads = num_threads or self.num_threads
+        self.session = self._load_onnx_session(None, quantized=self.backend == "onnx-int8")
+
+    @property
+    def model_id(self):
+        """Identifies the embedding space; quantized backends produce slightly different vectors."""
+        return f"{self.model_name}@{self.backend}"
+
+    def encode(self, texts):
+        """Embed a string or list of strings; returns a float32 array of shape (n, hidden_size)."""
+        if isinstance(texts, str):
+            texts = [texts]
+        if self.session is not None:
+            inputs = self.tokenizer(texts, return_tensors="np", truncation=True, padding=True, max_length=self.max_length)
+            feed = {"input_ids": inputs["input_ids"].astype(np.int64), "attention_mask": inputs["attention_mask"].astype(np.int64)}
+            last_hidden_state = self.session.run(["last_hidden_state"], feed)[0]
+            attention_mask = inputs["attention_mask"]
+        else:
+            inputs = self.tokenizer(texts, return_tensors="pt", truncation=True, padding=True, max_length=self.max_length)
+            with torch.no_grad():
+                last_hidden_state = self.model(**inputs).last_hidden_state.numpy()
+            attention_mask = inputs["attention_mask"].numpy()
+        return mean_pool(last_hidden_state, attention_mask).astype(np.float32)
+
+
+def encoder_from_env():
+    """Build the encoder configured by ENCODER_BACKEND and TORCH_NUM_THREADS."""
+    num_threads = os.getenv("TORCH_NUM_THREADS")
+    return QueryEncoder(backend=os.getenv("ENCODER_BACKEND", "torch"), num_threads=int(num_threads) if num_threads else None)
+
+
+def parity_check(reference, candidate, texts):
+    """Cosine similarity between the embeddings of two encoders for the same texts."""
+    a = reference.encode(texts)
+    b = candidate.encode(texts)
+    cosine = (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+    return {"min_cosine": float(cosine.min()), "mean_cosine": float(cosine.mean())}
+
+
+def benchmark(encoder, texts, batch_sizes=(1, 8, 64), repeats=3):
+    """Median latency per batch and throughput for each batch size."""
+    results = {}
+    for batch_size in batch_sizes:
+        batch = [texts[i % len(texts)] for i in range(batch_size)]
+        encoder.encode(batch)  # warm-up
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            encoder.encode(batch)
+            timings.append(time.perf_counter() - start)
+        latency = float(np.median(timings))
+        results[batch_size] = {"latency_ms": 1000 * latency, "texts_per_sec": batch_size / latency}
+    return results
+
+
+if __name__ == "__main__":
+    # Compare backends against the fp32 baseline:
+    #   python -m modules.encoder --backends torch torch-int8 onnx --threads 4
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Parity check and latency benchmark for the query encoder backends.")
+    parser.add_argument("--backends", type=str, nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--threads", type=int, default=None, help="torch / ONNX Runtime intra-op threads.")
+    parser.add_argument("--test_csv", type=str, default="data/test.csv", help="CSV whose 'questions' column is used as sample text.")
+    parser.add_argument("--batch_sizes", type=int, nargs="+", default=[1, 8, 64])
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.test_csv)
+    df.columns = [col.lower() for col in df.columns]
+    texts = [str(q) for q in df["questions"]]
+
+    baseline = QueryEncoder(backend="torch", num_threads=args.threads)
+    for backend in args.backends:
+        encoder = baseline if backend == "torch" else QueryEncoder(backend=backend, num_threads=args.threads)
+        parity = parity_check(baseline, encoder, texts)
+        print(f"{backend}: cosine vs fp32 min={parity['min_cosine']:.4f} mean={parity['mean_cosine']:.4f}")
+        for batch_size, result in benchmark(encoder, texts, args.batch_sizes).items():
+            print(f"  batch={batch_size:<3} {result['latency_ms']:8.1f} ms/batch  {result['texts_per_sec']:8.1f} texts/s")
@@ -0,0 +1,25 @@
+from modules.query_normalizer import faq_key
+
+# Canned answers for frequent Hindi/Hinglish/English questions, keyed by the lower-cased question.
+# Also the fast path when the LLM cannot answer within the turn's deadline (see modules/deadline.py).
+FAQ_ANSWERS = {
+    "what is the crif score, the cibil score?": "CRIF and CIBIL are credit bureaus. A CRIF score of 500-600 indicates a good profile.",
+    "kya interest rate hai?": "Interest rate aapke credit profile ke hisaab se vary karta hai, typically 6-20% APR.",
+    "what is the platform again?": "The platform is Instamoney, a LendingClub product.",
+    "who is asking for the money, from which platform they're asking?": "Borrowers Instamoney ke through apply karte hain, jo LendingClub ka loan platform hai.",
+    "and so the limit of lending 1 person is only 4 1000.": "Ek person ke liye lending limit 4,000 hai, lekin lump-sum plans mein 5,000 ho sakta hai.",
+    "no, sir, i haven’t created the account yet.": "Aap lendingclub.com ya Instamoney app par account create kar sakte hain.",
+    "so should i arrange a callback for him?": "Haan, callback arrange kiya ja sakta hai. Please details dijiye.",
+    "loan ka process kya hai?": "LendingClub par apply karein, credit profile check hoga, aur loan approve ho sakta hai.",
+    "cibil score kaise check karu?": "Aap Instamoney app ya LendingClub website par apna CIBIL score check kar sakte hain.",
+    "kya loan jaldi mil sakta hai?": "Haan, agar aapka credit profile accha hai, toh loan jaldi approve ho sakta hai."
+}
+
+
+# The same answers keyed by query_normalizer.faq_key, so Devanagari, re-spelled and reordered variants match
+_FAQ_BY_KEY = {faq_key(question): answer for question, answer in FAQ_ANSWERS.items()}
+
+
+def faq_answer(query):
+    """The canned answer for `query`, or None."""
+    return FAQ_ANSWERS.get(query.strip().lower()) or _FAQ_BY_KEY.get(faq_key(query))
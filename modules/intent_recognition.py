@@ -1,11 +1,20 @@
 import json
+import logging
 import os
-from transformers import pipeline
 import pandas as pd
 import numpy as np
+from modules.model_registry import registry, hf_pipeline_loader
+from modules.sentiment_head import SentimentHead, SENTIMENT_HEAD_PATH
+from modules.faq import faq_answer
+from modules.embedding_store import query_embedding_cache
+from modules.query_normalizer import retrieval_text, cache_key
 
-zero_shot_classifier = pipeline("zero-shot-classification", model="MoritzLaurer/mDeBERTa-v3-base-mnli-xnli", device=0)
-sentiment_analyzer = pipeline("sentiment-analysis", model="cardiffnlp/xlm-roberta-base-sentiment-multilingual", device=0)
+logger = logging.getLogger(__name__)
+
+# Loaded on first use in the precision set by MODEL_PRECISION / MODEL_PRECISION_<NAME>,
+# and unloaded after MODEL_IDLE_TIMEOUT seconds without use (see modules/model_registry.py)
+registry.register("zero_shot", hf_pipeline_loader("zero-shot-classification", "MoritzLaurer/mDeBERTa-v3-base-mnli-xnli"))
+registry.register("sentiment", hf_pipeline_loader("sentiment-analysis", "cardiffnlp/xlm-roberta-base-sentiment-multilingual"))
 
 INTENTS = [
     "greeting",
@@ -22,21 +31,64 @@ INTENTS = [
     "representation"
 ]
 
+# How sentiment is computed:
+#   "head":      linear head on the query embedding (modules/sentiment_head.py); no transformer pass of its own
+#   "zero_shot": extra labels in the intent model's zero-shot call; no second model in memory, but 3 more NLI pairs
+#   "model":     the separate XLM-R sentiment model
+#   "off":       no sentiment (every query is NEUTRAL), so no pass at all
+# "auto" uses the head when it has been trained (rag_cache/sentiment_head.npz) and is off otherwise;
+# set SENTIMENT_MODE=model to keep the XLM-R pass without a head.
+SENTIMENT_MODE = os.getenv("SENTIMENT_MODE", "auto")
+SENTIMENT_MODES = ("head", "zero_shot", "model", "off")
+# Zero-shot labels scored next to the intents in "zero_shot" mode
+ZERO_SHOT_SENTIMENTS = {"positive": "POSITIVE", "negative": "NEGATIVE", "neutral": "NEUTRAL"}
+
+_sentiment_head = None
+
+_warned_sentiment_off = False
+
+def sentiment_mode():
+    global _warned_sentiment_off
+    if SENTIMENT_MODE != "auto":
+        return SENTIMENT_MODE
+    if SENTIMENT_HEAD_PATH.exists():
+        return "head"
+    if not _warned_sentiment_off:
+        _warned_sentiment_off = True
+        logger.warning("No sentiment head at %s, so sentiment is off. Train one with `python -m modules.sentiment_head` "
+                       "or set SENTIMENT_MODE=model.", SENTIMENT_HEAD_PATH)
+    return "off"
+
+def _query_encoder():
+    # Shares the encoder response_gen registered; standalone use registers its own
+    if "query_encoder" not in registry.names():
+        from modules.encoder import encoder_from_env
+        registry.register("query_encoder", lambda precision, device: encoder_from_env(), device="cpu", idle_timeout=None)
+    return registry.get("query_encoder")
+
+def _get_sentiment_head():
+    global _sentiment_head
+    if _sentiment_head is None:
+        _sentiment_head = SentimentHead.load(SENTIMENT_HEAD_PATH)
+        logger.info("Loaded sentiment head from %s (trained on %s embeddings).", SENTIMENT_HEAD_PATH, _sentiment_head.model_id)
+        encoder_model_id = _query_encoder().model_id
+        if _sentiment_head.model_id != encoder_model_id:
+            logger.warning("The sentiment head was trained on %s embeddings but the query encoder is %s; "
+                           "retrain it with `python -m modules.sentiment_head`.", _sentiment_head.model_id, encoder_model_id)
+    return _sentiment_head
+
+def embed_queries(queries):
+    """
+    Query embeddings for the sentiment head, in the form and under the cache key retrieval
+    uses, so a query that has been retrieved for is not encoded again (and vice versa).
+    """
+    encoder = _query_encoder()
+    texts = [retrieval_text(query) for query in queries]
+    return query_embedding_cache.get_or_compute_many(encoder.model_id, texts, encoder.encode, keys=[cache_key(text) for text in texts])
+
 # Placeholder RAG function with expanded Hindi/Hinglish FAQs
 def rag_generate_response(query):
-    faq_dict = {
-        "what is the crif score, the cibil score?": "CRIF and CIBIL are credit bureaus. A CRIF score of 500-600 indicates a good profile.",
-        "kya interest rate hai?": "Interest rate aapke credit profile ke hisaab se vary karta hai, typically 6-20% APR.",
-        "what is the platform again?": "The platform is Instamoney, a LendingClub product.",
-        "who is asking for the money, from which platform they're asking?": "Borrowers Instamoney ke through apply karte hain, jo LendingClub ka loan platform hai.",
-        "and so the limit of lending 1 person is only 4 1000.": "Ek person ke liye lending limit 4,000 hai, lekin lump-sum plans mein 5,000 ho sakta hai.",
-        "no, sir, i haven’t created the account yet.": "Aap lendingclub.com ya Instamoney app par account create kar sakte hain.",
-        "so should i arrange a callback for him?": "Haan, callback arrange kiya ja sakta hai. Please details dijiye.",
-        "loan ka process kya hai?": "LendingClub par apply karein, credit profile check hoga, aur loan approve ho sakta hai.",
-        "cibil score kaise check karu?": "Aap Instamoney app ya LendingClub website par apna CIBIL score check kar sakte hain.",
-        "kya loan jaldi mil sakta hai?": "Haan, agar aapka credit profile accha hai, toh loan jaldi approve ho sakta hai."
-    }
-    return faq_dict.get(query.lower(), f"Generated response for: {query}")
+    return faq_answer(query) or f"Generated response for: {query}"
 
 # Load transcript JSON file
 def load_transcript(json_file):
@@ -51,7 +103,7 @@ def load_transcript(json_file):
             raise ValueError("Transcript JSON must be a list or contain a 'segments' list")
         return data
     except Exception as e:
-        print(f"Error loading transcript: {e}")
+        logger.error("Error loading transcript %s: %s", json_file, e)
         return []
 
 # Extract all user queries
@@ -59,45 +111,95 @@ def get_user_queries(transcript):
     try:
         return [entry["text"].strip() for entry in transcript if isinstance(entry, dict) and entry.get("speaker_id") == "speaker_1" and entry["text"].strip() != "..."]
     except Exception as e:
-        print(f"Error extracting queries: {e}")
+        logger.error("Error extracting queries: %s", e)
         return []
 
+# Intents within `confidence_margin` of the best one, or "ambiguous"
+def _select_intents(labels, scores, confidence_margin, ambiguity_threshold):
+    intents = []
+    confidences = []
+    max_confidence = max(scores)
+    
+    for label, score in zip(labels, scores):
+        if score >= (max_confidence - confidence_margin):
+            intents.append(label)
+            confidences.append(round(score, 4))
+    
+    if not intents or (max_confidence < ambiguity_threshold and sum(confidences) < 1.0):
+        return ["ambiguous"], [max_confidence]
+    
+    return intents, confidences
+
 # Multi-intent recognition with highest confidences
 def detect_intents(query, confidence_margin=0.1, ambiguity_threshold=0.7):
     try:
-        result = zero_shot_classifier(query, candidate_labels=INTENTS, multi_label=True)
-        intents = []
-        confidences = []
-        max_confidence = max(result["scores"])
-        
-        for label, score in zip(result["labels"], result["scores"]):
-            if score >= (max_confidence - confidence_margin):
-                intents.append(label)
-                confidences.append(round(score, 4))
-        
-        if not intents or (max_confidence < ambiguity_threshold and sum(confidences) < 1.0):
-            return ["ambiguous"], [max(result["scores"])]
-        
-        return intents, confidences
+        result = registry.get("zero_shot")(query, candidate_labels=INTENTS, multi_label=True)
+        return _select_intents(result["labels"], result["scores"], confidence_margin, ambiguity_threshold)
     except Exception as e:
-        print(f"Error in intent detection for '{query}': {e}")
+        logger.error("Error in intent detection: %s", e)
         return ["ambiguous"], [0.0]
 
-# Sentiment analysis and tone adjustment
-def analyze_sentiment_and_adjust_tone(query, response):
+# Intents and sentiment for a batch of queries in one pass over the shared models
+def classify_queries(queries, embeddings=None, mode=None, confidence_margin=0.1, ambiguity_threshold=0.7, batch_size=16):
+    """
+    Returns one (intents, confidences, sentiment, sentiment_score) tuple per query.
+    `embeddings` are the queries' embeddings when the caller already has them (used by
+    the "head" mode, which otherwise takes them from the shared query embedding cache);
+    `mode` overrides SENTIMENT_MODE. The pipelines run `batch_size` inputs per forward pass.
+    """
+    mode = mode or sentiment_mode()
+    if mode not in SENTIMENT_MODES:
+        raise ValueError(f"Unknown sentiment mode '{mode}'. Choose one of {', '.join(SENTIMENT_MODES)}.")
+    if not queries:
+        return []
+    labels = INTENTS + list(ZERO_SHOT_SENTIMENTS) if mode == "zero_shot" else INTENTS
+
+    try:
+        results = registry.get("zero_shot")(list(queries), candidate_labels=labels, multi_label=True, batch_size=batch_size)
+        if isinstance(results, dict):
+            results = [results]
+    except Exception as e:
+        logger.error("Error in intent detection for %d queries: %s", len(queries), e)
+        return [(["ambiguous"], [0.0], "NEUTRAL", 0.0) for _ in queries]
+
+    intents = []
+    zero_shot_sentiments = []
+    for result in results:
+        scores = dict(zip(result["labels"], result["scores"]))
+        intent_labels = [label for label in result["labels"] if label in INTENTS]
+        intents.append(_select_intents(intent_labels, [scores[label] for label in intent_labels], confidence_margin, ambiguity_threshold))
+        if mode == "zero_shot":
+            # multi_label scores each label on its own; renormalize over the three sentiments
+            total = sum(scores[label] for label in ZERO_SHOT_SENTIMENTS) or 1.0
+            best = max(ZERO_SHOT_SENTIMENTS, key=lambda label: scores[label])
+            zero_shot_sentiments.append((ZERO_SHOT_SENTIMENTS[best], scores[best] / total))
+
     try:
-        sentiment_result = sentiment_analyzer(query)[0]
-        sentiment = sentiment_result["label"].lower()
-        score = sentiment_result["score"]
-        sentiment_label = sentiment.upper()
-        if sentiment_label == "POSITIVE":
-            return f"Great to hear! {response}", sentiment_label, score
-        elif sentiment_label == "NEGATIVE":
-            return f"We are sorry for any trouble caused. {response}", sentiment_label, score
-        return response, sentiment_label, score
+        if mode == "zero_shot":
+            sentiments = zero_shot_sentiments
+        elif mode == "off":
+            sentiments = [("NEUTRAL", 0.0)] * len(queries)
+        elif mode == "head":
+            if embeddings is None:
+                embeddings = embed_queries(list(queries))
+            sentiments = list(zip(*_get_sentiment_head().predict(embeddings)))
+        else:
+            sentiments = [(result["label"].upper(), result["score"])
+                          for result in registry.get("sentiment")(list(queries), batch_size=batch_size)]
     except Exception as e:
-        print(f"Error in sentiment analysis for '{query}': {e}")
-        return response, "NEUTRAL", 0.0
+        logger.error("Error in sentiment analysis for %d queries: %s", len(queries), e)
+        sentiments = [("NEUTRAL", 0.0)] * len(queries)
+
+    return [(query_intents, confidences, sentiment, score)
+            for (query_intents, confidences), (sentiment, score) in zip(intents, sentiments)]
+
+# Prefix the response according to the sentiment of the query
+def adjust_tone(response, sentiment_label):
+    if sentiment_label == "POSITIVE":
+        return f"Great to hear! {response}"
+    elif sentiment_label == "NEGATIVE":
+        return f"We are sorry for any trouble caused. {response}"
+    return response
 
 # Full NLP pipeline for all queries
 def nlp_pipeline(json_file, output_file):
@@ -107,8 +209,9 @@ def nlp_pipeline(json_file, output_file):
         results = [{"query": "", "intents": ["none"], "confidences": [0.0], "sentiment": "none", "sentiment_score": 0.0, "response": "No user input detected."}]
     else:
         results = []
-        for query in queries:
-            intents, confidences = detect_intents(query)
+        # Intents and sentiment for the whole transcript in one batched pass
+        classified = classify_queries(queries)
+        for query, (intents, confidences, sentiment, sentiment_score) in zip(queries, classified):
             if "ambiguous" in intents:
                 result = {
                     "query": query,
@@ -120,7 +223,7 @@ def nlp_pipeline(json_file, output_file):
                 }
             else:
                 rag_response = rag_generate_response(query)
-                final_response, sentiment, sentiment_score = analyze_sentiment_and_adjust_tone(query, rag_response)
+                final_response = adjust_tone(rag_response, sentiment)
                 result = {
                     "query": query,
                     "intents": intents,
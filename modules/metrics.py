@@ -0,0 +1,60 @@
+import threading
+import time
+
+# Process-wide metrics registry: counters, gauges (numbers or strings) and timings.
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_timings = {}
+
+
+def increment(name, value=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def set_gauge(name, value):
+    with _lock:
+        _gauges[name] = value
+
+
+def observe(name, seconds):
+    """Record one duration in seconds."""
+    with _lock:
+        timing = _timings.setdefault(name, {"count": 0, "total_s": 0.0, "max_s": 0.0, "last_s": 0.0})
+        timing["count"] += 1
+        timing["total_s"] += seconds
+        timing["max_s"] = max(timing["max_s"], seconds)
+        timing["last_s"] = seconds
+
+
+class timed:
+    """Context manager that records the duration of its block under `name`."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def snapshot():
+    """Copy of all metrics, e.g. for logging or a status endpoint."""
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+            "timings": {name: dict(timing) for name, timing in _timings.items()},
+        }
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _timings.clear()
@@ -0,0 +1,241 @@
+import argparse
+import gc
+import logging
+import os
+import threading
+import time
+import torch
+from modules import metrics
+
+logger = logging.getLogger(__name__)
+
+PRECISIONS = ("fp32", "fp16", "bf16", "int8")
+TORCH_DTYPES = {"fp16": torch.float16, "bf16": torch.bfloat16}
+# Models unused for this many seconds are unloaded and reloaded on their next use (0 disables it)
+DEFAULT_IDLE_TIMEOUT = float(os.getenv("MODEL_IDLE_TIMEOUT", "600"))
+
+
+def precision_from_env(name):
+    """MODEL_PRECISION_<NAME> (e.g. MODEL_PRECISION_ZERO_SHOT=int8), else MODEL_PRECISION, else fp32."""
+    precision = os.getenv(f"MODEL_PRECISION_{name.upper()}", os.getenv("MODEL_PRECISION", "fp32")).lower()
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision '{precision}' for model '{name}'. Choose one of {', '.join(PRECISIONS)}.")
+    return precision
+
+
+def default_device():
+    """MODEL_DEVICE if set, otherwise the first GPU when there is one."""
+    return os.getenv("MODEL_DEVICE") or ("cuda" if torch.cuda.is_available() else "cpu")
+
+
+def hf_pipeline_loader(task, model_name):
+    """Loader for a transformers pipeline that honours the registry's precision and device."""
+
+    def load(precision, device):
+        from transformers import pipeline
+        if precision == "int8" and device != "cpu":
+            # Dynamic quantization only has CPU kernels
+            logger.warning("int8 %s runs on the CPU instead of %s.", model_name, device)
+            device = "cpu"
+        kwargs = {"torch_dtype": TORCH_DTYPES[precision]} if precision in TORCH_DTYPES else {}
+        pipe = pipeline(task, model=model_name, device=device, **kwargs)
+        if precision == "int8":
+            pipe.model = torch.quantization.quantize_dynamic(pipe.model, {torch.nn.Linear}, dtype=torch.qint8)
+        return pipe
+
+    return load
+
+
+def _torch_modules(obj):
+    """The torch modules held by a pipeline, a QueryEncoder or a bare module."""
+    if isinstance(obj, torch.nn.Module):
+        return [obj]
+    model = getattr(obj, "model", None)
+    return [model] if isinstance(model, torch.nn.Module) else []
+
+
+def weight_bytes(obj):
+    """Bytes held by the parameters and buffers (including quantized packed weights) of `obj`."""
+    total = 0
+    for module in _torch_modules(obj):
+        for tensor in list(module.parameters()) + list(module.buffers()):
+            total += tensor.numel() * tensor.element_size()
+        # Dynamically quantized Linear layers keep their int8 weights outside parameters()
+        for submodule in module.modules():
+            packed = getattr(submodule, "_packed_params", None)
+            if packed is not None and hasattr(packed, "_weight_bias"):
+                weight, bias = packed._weight_bias()
+                total += weight.numel() * weight.element_size()
+                if bias is not None:
+                    total += bias.numel() * bias.element_size()
+    return total
+
+
+def rss_bytes():
+    """Resident set size of this process, or None where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+class _Entry:
+    def __init__(self, name, loader, precision, device, idle_timeout):
+        self.name = name
+        self.loader = loader
+        self.precision = precision
+        self.device = device
+        self.idle_timeout = idle_timeout
+        self.model = None
+        self.lock = threading.Lock()
+        self.last_used = 0.0
+        self.loads = 0
+        self.load_seconds = 0.0
+        self.weight_bytes = 0
+        self.rss_delta_bytes = None
+
+
+class ModelRegistry:
+    """
+    Loads models on first use instead of at import time, in the precision chosen per
+    deployment, and unloads models that have been idle for longer than their timeout.
+
+    Callers fetch the model with `get(name)` for every use rather than keeping a
+    reference, so an unloaded model is simply reloaded the next time it is needed.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._reaper = None
+        self._stop_reaping = threading.Event()
+
+    def register(self, name, loader, precision=None, device=None, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        """
+        Register `loader(precision, device)` under `name` without loading it.
+        `idle_timeout` of None or 0 keeps the model loaded once it is.
+        """
+        precision = precision or precision_from_env(name)
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision '{precision}' for model '{name}'. Choose one of {', '.join(PRECISIONS)}.")
+        self._entries[name] = _Entry(name, loader, precision, device or default_device(), idle_timeout)
+
+    def names(self):
+        return list(self._entries)
+
+    def pin(self, name):
+        """Keep `name` loaded once it is, whatever idle timeout it was registered with."""
+        self._entries[name].idle_timeout = None
+
+    def is_loaded(self, name):
+        return self._entries[name].model is not None
+
+    def get(self, name):
+        entry = self._entries[name]
+        with entry.lock:
+            if entry.model is None:
+                self._load(entry)
+            entry.last_used = time.monotonic()
+            return entry.model
+
+    def _load(self, entry):
+        logger.info("Loading model '%s' (%s on %s)...", entry.name, entry.precision, entry.device)
+        rss_before = rss_bytes()
+        start = time.perf_counter()
+        entry.model = entry.loader(entry.precision, entry.device)
+        entry.load_seconds = time.perf_counter() - start
+        rss_after = rss_bytes()
+        entry.loads += 1
+        entry.weight_bytes = weight_bytes(entry.model)
+        entry.rss_delta_bytes = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+        metrics.increment(f"models.{entry.name}.loads")
+        metrics.observe(f"models.{entry.name}.load_seconds", entry.load_seconds)
+        metrics.set_gauge(f"models.{entry.name}.weights_mb", round(entry.weight_bytes / 2**20, 1))
+        logger.info("Model '%s' loaded in %.1fs (%.0f MB of weights).", entry.name, entry.load_seconds, entry.weight_bytes / 2**20)
+
+    def unload(self, name):
+        entry = self._entries[name]
+        with entry.lock:
+            if entry.model is None:
+                return False
+            entry.model = None
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        metrics.increment(f"models.{name}.unloads")
+        metrics.set_gauge(f"models.{name}.weights_mb", 0)
+        logger.info("Unloaded model '%s'.", name)
+        return True
+
+    def unload_idle(self):
+        """Unload every model idle for longer than its timeout. Returns the names unloaded."""
+        now = time.monotonic()
+        idle = [entry.name for entry in self._entries.values()
+                if entry.model is not None and entry.idle_timeout and now - entry.last_used > entry.idle_timeout]
+        return [name for name in idle if self.unload(name)]
+
+    def start_reaper(self, interval=30.0):
+        """Check for idle models every `interval` seconds in a background thread."""
+        if self._reaper is not None:
+            return
+        self._stop_reaping.clear()
+
+        def reap():
+            while not self._stop_reaping.wait(interval):
+                self.unload_idle()
+
+        self._reaper = threading.Thread(target=reap, daemon=True, name="model-reaper")
+        self._reaper.start()
+
+    def stop_reaper(self):
+        self._stop_reaping.set()
+        self._reaper = None
+
+    def memory_report(self):
+        """One row per registered model; weights are measured from the tensors, rss_delta at load time."""
+        now = time.monotonic()
+        report = []
+        for entry in self._entries.values():
+            loaded = entry.model is not None
+            report.append({
+                "name": entry.name,
+                "loaded": loaded,
+                "precision": entry.precision,
+                "device": entry.device,
+                "weights_mb": round(entry.weight_bytes / 2**20, 1) if loaded else 0.0,
+                "rss_delta_mb": round(entry.rss_delta_bytes / 2**20, 1) if loaded and entry.rss_delta_bytes is not None else None,
+                "load_seconds": round(entry.load_seconds, 2),
+                "loads": entry.loads,
+                "idle_seconds": round(now - entry.last_used, 1) if loaded else None,
+            })
+        return report
+
+    def print_memory_report(self):
+        print(f"{'model':<16}{'loaded':>8}{'precision':>11}{'device':>8}{'weights':>11}{'rss delta':>12}{'load':>8}")
+        for row in self.memory_report():
+            rss_delta = f"{row['rss_delta_mb']:.0f} MB" if row["rss_delta_mb"] is not None else "-"
+            print(f"{row['name']:<16}{str(row['loaded']):>8}{row['precision']:>11}{row['device']:>8}"
+                  f"{row['weights_mb']:>8.0f} MB{rss_delta:>12}{row['load_seconds']:>7.1f}s")
+        process_rss = rss_bytes()
+        if process_rss is not None:
+            print(f"Process RSS: {process_rss / 2**20:.0f} MB")
+
+
+# Process-wide registry; modules register the models they use at import time
+registry = ModelRegistry()
+
+
+if __name__ == "__main__":
+    # Load models and print what each costs, e.g. to compare precisions:
+    #   MODEL_PRECISION=int8 python -m modules.model_registry zero_shot sentiment
+    parser = argparse.ArgumentParser(description="Load registered models and report their memory use.")
+    parser.add_argument("models", type=str, nargs="*", help="Models to load (default: all registered models).")
+    args = parser.parse_args()
+
+    os.environ.setdefault("GROQ_API_KEY", "unused-for-memory-report")
+    from modules import intent_recognition, response_gen  # noqa: F401 (registers the models)
+    # Run as a script this file is __main__, so use the registry instance the modules registered with
+    from modules.model_registry import registry as shared_registry
+    for model_name in args.models or shared_registry.names():
+        shared_registry.get(model_name)
+    shared_registry.print_memory_report()
@@ -2,16 +2,22 @@ import os
 import requests
 import json
 import re
+import logging
 from dotenv import load_dotenv
+from modules.deadline import TTS_RESERVE_SECONDS, REPHRASE_MIN_SECONDS, FILLER_TEXT
 
 load_dotenv()
 GROQ_API_KEY = os.getenv('GROQ_API_KEY')
 
+logger = logging.getLogger(__name__)
+
 GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
 GROQ_MODEL = "llama-3.3-70b-versatile"
+# Upper bound on a request made without a turn deadline
+GROQ_TIMEOUT_SECONDS = float(os.getenv("GROQ_TIMEOUT_SECONDS", "30"))
 
 
-def interpret_command_with_api(user_input):
+def interpret_command_with_api(user_input, timeout=None):
     headers = {
         "Content-Type": "application/json",
         "Authorization": f"Bearer {GROQ_API_KEY}"
@@ -24,21 +30,35 @@ def interpret_command_with_api(user_input):
         }]
     }
     try:
-        response = requests.post(GROQ_API_URL, headers=headers, data=json.dumps(data))
+        response = requests.post(GROQ_API_URL, headers=headers, data=json.dumps(data), timeout=timeout or GROQ_TIMEOUT_SECONDS)
         response.raise_for_status()
         result = response.json()
         command = result["choices"][0]["message"]["content"].strip()
         command = re.sub(r"```(bash|shell)?", "", command).strip()
         return command
     except Exception as e:
-        print(f"Error calling Groq API: {e}")
+        logger.error("Error calling Groq API: %s", e)
         return "Error interpreting command."
 
 
-def middleman(user_input, context, data):
+def middleman(user_input, context, data, deadline=None):
+    # The rephrase is optional polish: with a turn deadline it is skipped rather than allowed to
+    # push text-to-speech past the budget, and a failed rephrase falls back to the RAG answer
+    if data == FILLER_TEXT:
+        return data
+    if deadline is not None and not deadline.can_afford(REPHRASE_MIN_SECONDS, reserve=TTS_RESERVE_SECONDS):
+        deadline.fallback("skip_rephrase")
+        return data
     sentence = f"USER_INPUT: {user_input}; SYSTEM_OUTPUT: {data}; . The user is asking the USER_INPUT with some sentiments and intent. As a responder, Rephrase the SYSTEM_OUTPUT to be a perfect response to the user's question.. Keep it MAXIMUM 2 lines. as youre a chatbot, you and the user have been speaking in a flow. this is the context of the conversation so far: {context}"
 
-    command = interpret_command_with_api(sentence)
+    if deadline is None:
+        command = interpret_command_with_api(sentence)
+    else:
+        command = interpret_command_with_api(sentence, timeout=deadline.timeout(reserve=TTS_RESERVE_SECONDS))
+        deadline.check("rephrase")
     if command.startswith("Error"):
+        if deadline is not None:
+            deadline.fallback("skip_rephrase")
+            return data
         return command
     return command
@@ -0,0 +1,59 @@
+import logging
+import multiprocessing
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Set in the parent right before the pool forks, so workers inherit it (and every
+# model / index the parent has loaded) copy-on-write instead of receiving a pickle.
+_answer_fn = None
+
+
+def _init_worker(threads_per_worker, worker_setup):
+    try:
+        import torch
+        torch.set_num_threads(threads_per_worker)
+    except ImportError:
+        pass
+    if worker_setup is not None:
+        worker_setup(threads_per_worker)
+
+
+def _answer(item):
+    index, question = item
+    return index, _answer_fn(question)
+
+
+def fork_available():
+    return "fork" in multiprocessing.get_all_start_methods()
+
+
+def answer_in_parallel(answer_fn, questions, workers, threads_per_worker=None, worker_setup=None):
+    """
+    Answer `questions` with `answer_fn` on a pool of `workers` forked processes and
+    return the answers in input order.
+
+    The pool is forked after the caller has loaded the encoder, FAISS index and
+    chunks, so workers share them copy-on-write (the chunk embeddings are mmap-ed).
+    Each worker gets `threads_per_worker` torch intra-op threads, by default the
+    CPU count divided evenly between the workers. `worker_setup(threads_per_worker)`
+    runs in every worker after it starts, for state that cannot be inherited across
+    fork() (e.g. ONNX Runtime sessions).
+    """
+    global _answer_fn
+    if threads_per_worker is None:
+        threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+    _answer_fn = answer_fn
+
+    answers = [None] * len(questions)
+    start = time.perf_counter()
+    context = multiprocessing.get_context("fork")
+    logger.info("Answering %d questions with %d workers x %d threads...", len(questions), workers, threads_per_worker)
+    with context.Pool(workers, initializer=_init_worker, initargs=(threads_per_worker, worker_setup)) as pool:
+        # Questions are handed out one at a time so slow LLM calls do not leave other workers idle
+        for done, (index, answer) in enumerate(pool.imap_unordered(_answer, enumerate(questions)), start=1):
+            answers[index] = answer
+            elapsed = time.perf_counter() - start
+            logger.info("Processed %d/%d questions (%.2f questions/s)", done, len(questions), done / elapsed)
+    return answers
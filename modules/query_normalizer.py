@@ -0,0 +1,277 @@
+import argparse
+import os
+import re
+import unicodedata
+from collections import namedtuple
+from functools import lru_cache
+
+# QUERY_NORMALIZATION=0 turns the stage off: retrieval sees the raw query and caches key on its lower-cased text
+QUERY_NORMALIZATION = os.getenv("QUERY_NORMALIZATION", "1") != "0"
+
+# Words are runs of word characters or Devanagari (whose vowel signs and virama are not \w). Dotted, slashed
+# and hyphenated identifiers and decimals ("NRBI/DNBR/2017-18/57", "11.5") stay one token, as BM25 indexes them
+_TOKEN_RE = re.compile(r"[ऀ-ॣ०-ॿ]+|\w+(?:[./-]\w+)+|\w+", re.UNICODE)
+_DEVANAGARI_RE = re.compile(r"[ऀ-ॿ]")
+_LATIN_RE = re.compile(r"[A-Za-z]")
+
+# --- Devanagari -> Latin, in the Hinglish spelling people type (e.g. कैसे -> kaise, सकता -> sakta) ---
+_CONSONANTS = {
+    "क": "k", "ख": "kh", "ग": "g", "घ": "gh", "ङ": "n",
+    "च": "ch", "छ": "chh", "ज": "j", "झ": "jh", "ञ": "n",
+    "ट": "t", "ठ": "th", "ड": "d", "ढ": "dh", "ण": "n",
+    "त": "t", "थ": "th", "द": "d", "ध": "dh", "न": "n",
+    "प": "p", "फ": "ph", "ब": "b", "भ": "bh", "म": "m",
+    "य": "y", "र": "r", "ल": "l", "व": "v",
+    "श": "sh", "ष": "sh", "स": "s", "ह": "h", "ळ": "l",
+    # Precomposed nukta forms
+    "क़": "k", "ख़": "kh", "ग़": "g", "ज़": "z", "ड़": "r", "ढ़": "rh", "फ़": "f", "य़": "y",
+}
+# A nukta after a plain consonant gives the same sound as the precomposed form
+_NUKTA_FORMS = {"k": "k", "kh": "kh", "g": "g", "j": "z", "d": "r", "dh": "rh", "ph": "f", "y": "y"}
+_VOWELS = {
+    "अ": "a", "आ": "aa", "इ": "i", "ई": "i", "उ": "u", "ऊ": "u", "ऋ": "ri",
+    "ए": "e", "ऐ": "ai", "ओ": "o", "औ": "au", "ऑ": "o", "ऍ": "e",
+}
+_VOWEL_SIGNS = {
+    "ा": "a", "ि": "i", "ी": "i", "ु": "u", "ू": "u", "ृ": "ri",
+    "े": "e", "ै": "ai", "ो": "o", "ौ": "au", "ॉ": "o", "ॅ": "e",
+}
+_NASALS = {"ं", "ँ"}
+_VISARGA = "ः"
+_VIRAMA = "्"
+_NUKTA = "़"
+_DIGITS = {chr(0x0966 + i): str(i) for i in range(10)}
+
+# --- Hinglish spelling normalization: variant -> canonical spelling ---
+HINGLISH_SPELLINGS = {
+    "kia": "kya", "kyaa": "kya",
+    "hu": "hoon", "hun": "hoon", "hoo": "hoon",
+    "me": "mein", "men": "mein", "mei": "mein", "mai": "main",
+    "lie": "liye", "liy": "liye", "liyee": "liye",
+    "kese": "kaise", "kaisey": "kaise", "kayse": "kaise",
+    "kon": "kaun", "koun": "kaun", "konse": "kaunse", "konsa": "kaunsa",
+    "chahie": "chahiye", "chaiye": "chahiye", "chahiyee": "chahiye",
+    "nahin": "nahi", "nhi": "nahi",
+    "karun": "karu", "karoon": "karu", "sath": "saath", "ye": "yeh", "yah": "yeh", "muje": "mujhe",
+    "he": "hai", "h": "hai",
+    # Gender / number inflections of "can" are one entry for caching purposes
+    "sakti": "sakta", "sakte": "sakta",
+}
+# English words as they come out of Devanagari (or are typed phonetically), back to English
+LOANWORDS = {
+    "rajistreshan": "registration", "rejistreshan": "registration", "rajistar": "register", "rejistar": "register",
+    "dakyuments": "documents", "dakyument": "document", "dokyuments": "documents", "dokyument": "document",
+    "lon": "loan", "repaiments": "repayments", "repaiment": "repayment", "traik": "track", "trak": "track",
+    "investament": "investment", "veriphikeshan": "verification", "verifikeshan": "verification",
+    "proses": "process", "prosess": "process", "borrovers": "borrowers", "borrover": "borrower",
+    "borovers": "borrowers", "borover": "borrower", "platpharm": "platform", "platfarm": "platform",
+    "kampani": "company", "intrest": "interest", "intarest": "interest", "skor": "score", "klab": "club",
+    "ret": "rate", "sibil": "cibil", "chek": "check",
+}
+# Hindi words whose English equivalent Hinglish speakers usually say instead
+HINDI_GLOSSARY = {
+    "samay": "time", "surakshit": "safe", "kai": "multiple", "zarurat": "required", "jarurat": "required",
+    "chahiye": "required", "byaj": "interest", "paisa": "money", "paise": "money", "nivesh": "investment",
+}
+# Latin-script text with any of these words is treated as Hinglish rather than English
+_HINGLISH_MARKERS = {
+    "kya", "kia", "hai", "hain", "ke", "ki", "ka", "ko", "kaise", "kese", "kaun", "kon", "kaunse", "konse",
+    "mein", "mai", "hoon", "hu", "kitna", "kitne", "sakta", "sakti", "sakte", "chahiye", "liye", "apne", "mera",
+    "meri", "yeh", "nahi", "dwara", "karna", "kar", "raha", "rahi",
+}
+# Dropped from the FAQ key only; retrieval and the caches still see them
+STOPWORDS = {
+    # English
+    "a", "an", "the", "is", "are", "am", "was", "were", "be", "do", "does", "did", "i", "my", "me", "we", "our",
+    "you", "your", "it", "its", "to", "of", "for", "on", "at", "in", "by", "with", "and", "or", "so", "this",
+    "that", "what", "how", "can", "could", "should", "would", "will", "there", "here", "any", "please",
+    # Hinglish
+    "kya", "hai", "hain", "ke", "ki", "ka", "ko", "se", "mein", "main", "mera", "meri", "mere", "apna", "apne",
+    "apni", "kaise", "kar", "karna", "karu", "sakta", "hoon", "ho", "yeh", "woh", "kaun", "kin", "kaunse",
+    "kaunsa", "liye", "par", "pe", "bhi", "toh", "aur", "dwara",
+}
+# Multi-word names written with or without a space
+_PHRASES = {"lenden club": "lendenclub", "len den club": "lendenclub"}
+
+NormalizedQuery = namedtuple("NormalizedQuery", ["text", "faq_key", "script", "language"])
+
+
+def detect_script(text):
+    """"devanagari", "latin", "mixed" or "other"."""
+    has_devanagari = bool(_DEVANAGARI_RE.search(text))
+    has_latin = bool(_LATIN_RE.search(text))
+    if has_devanagari and has_latin:
+        return "mixed"
+    if has_devanagari:
+        return "devanagari"
+    return "latin" if has_latin else "other"
+
+
+def _transliterate_word(word):
+    # Syllables as [consonant, vowel, has_inherent_schwa]; a virama leaves the vowel empty
+    syllables = []
+    for ch in word.replace("ज्ञ", "ग्य"):
+        if ch in _CONSONANTS:
+            syllables.append([_CONSONANTS[ch], "a", True])
+        elif ch == _NUKTA and syllables:
+            syllables[-1][0] = _NUKTA_FORMS.get(syllables[-1][0], syllables[-1][0])
+        elif ch == _VIRAMA and syllables:
+            syllables[-1][1:] = ["", False]
+        elif ch in _VOWEL_SIGNS:
+            if syllables and syllables[-1][2]:
+                syllables[-1][1:] = [_VOWEL_SIGNS[ch], False]
+            else:
+                syllables.append(["", _VOWEL_SIGNS[ch], False])
+        elif ch in _VOWELS:
+            syllables.append(["", _VOWELS[ch], False])
+        elif ch in _NASALS and syllables:
+            # A nasalised inherent vowel is pronounced, so it is no longer a deletable schwa
+            syllables[-1][1:] = [syllables[-1][1] + "n", False]
+        elif ch == _VISARGA and syllables:
+            syllables[-1][1] += "h"
+        elif ch in _DIGITS:
+            syllables.append([_DIGITS[ch], "", False])
+
+    # Hindi drops the inherent schwa at the end of a word (कमल -> kamal) and between a
+    # vowel-bearing part and a following consonant + vowel (सकता -> sakta, जनता -> janta)
+    if len(syllables) > 1 and syllables[-1][2]:
+        syllables[-1][1:] = ["", False]
+    for i in range(len(syllables) - 2, 0, -1):
+        following = syllables[i + 1]
+        if syllables[i][2] and following[0] and following[1] and any(s[1] for s in syllables[:i]):
+            syllables[i][1:] = ["", False]
+    return "".join(consonant + vowel for consonant, vowel, _ in syllables)
+
+
+@lru_cache(maxsize=65536)
+def transliterate(word):
+    """Latin spelling of a Devanagari word; other words are returned unchanged."""
+    return _transliterate_word(word) if _DEVANAGARI_RE.search(word) else word
+
+
+def _key_words(words):
+    key_words = []
+    for word in words:
+        if word in STOPWORDS:
+            continue
+        # Plural and singular share an entry (documents / document, companies / company)
+        if len(word) > 4 and word.endswith("ies"):
+            word = word[:-3] + "y"
+        elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        key_words.append(word)
+    return key_words
+
+
+def _bag_of_words_key(words):
+    return " ".join(sorted(set(_key_words(words)))) or " ".join(words)
+
+
+@lru_cache(maxsize=8192)
+def normalize_query(query):
+    """
+    NormalizedQuery(text, faq_key, script, language) for a user query.
+
+    `text` is the query in one script and spelling: Devanagari is transliterated to
+    Hinglish and Hinglish spellings, loanwords and common Hindi words are mapped onto
+    one form. Retrieval searches with it and the embedding and answer caches key on it.
+    `faq_key` additionally drops stopwords, plural endings and word order, which merges
+    questions that mean different things ("should I invest" / "can I invest"), so it is
+    only matched against the curated FAQ questions.
+    """
+    script = detect_script(query)
+    text = unicodedata.normalize("NFC", query).lower()
+    words = [transliterate(token) for token in _TOKEN_RE.findall(text)]
+
+    if script in ("devanagari", "mixed") or any(word in _HINGLISH_MARKERS for word in words):
+        language = "hi" if script == "devanagari" else "hinglish"
+        words = [HINGLISH_SPELLINGS.get(word, word) for word in words]
+        words = [HINDI_GLOSSARY.get(word, word) for word in words]
+    else:
+        language = "en"
+    words = [LOANWORDS.get(word, word) for word in words]
+    # Names are joined once every word is in Latin script (लेनदेन क्लब -> lenden club -> lendenclub)
+    text = " ".join(words)
+    for phrase, replacement in _PHRASES.items():
+        text = re.sub(rf"\b{phrase}\b", replacement, text)
+    words = text.split()
+    return NormalizedQuery(" ".join(words), _bag_of_words_key(words), script, language)
+
+
+def retrieval_text(query):
+    """The form of `query` that retrieval searches with."""
+    return normalize_query(query).text if QUERY_NORMALIZATION else query
+
+
+def cache_key(query):
+    """The key `query` is stored under in the embedding and answer caches: its normalized text."""
+    return normalize_query(query).text if QUERY_NORMALIZATION else " ".join(query.lower().split())
+
+
+def faq_key(query):
+    """The key `query` is looked up with in the FAQ; unlike `cache_key` it ignores word order."""
+    return normalize_query(query).faq_key if QUERY_NORMALIZATION else " ".join(query.lower().split())
+
+
+def cache_hit_report(queries, passes=1):
+    """
+    Hit-rate of a cache keyed by the old lower-cased text, the normalized text and the
+    FAQ key when `queries` are replayed `passes` times: a query hits when an
+    earlier one had the same key.
+    """
+    from modules.embedding_store import normalize_query_text
+    report = {}
+    key_fns = (("lowercase", normalize_query_text), ("normalized", lambda q: normalize_query(q).text),
+               ("faq", lambda q: normalize_query(q).faq_key))
+    for name, key_fn in key_fns:
+        seen = set()
+        hits = 0
+        by_language = {}
+        for _ in range(passes):
+            for query in queries:
+                key = key_fn(query)
+                language = normalize_query(query).language
+                stats = by_language.setdefault(language, [0, 0])
+                stats[1] += 1
+                if key in seen:
+                    hits += 1
+                    stats[0] += 1
+                seen.add(key)
+        report[name] = {
+            "hit_rate": hits / (len(queries) * passes),
+            "distinct_keys": len(seen),
+            "hit_rate_by_language": {language: h / n for language, (h, n) in by_language.items()},
+        }
+    return report
+
+
+if __name__ == "__main__":
+    # Cache hit-rate on multilingual traffic with and without query normalization:
+    #   python -m modules.query_normalizer data/test.csv --passes 3
+    import pandas as pd
+    from modules.intent_recognition import load_transcript, get_user_queries
+
+    parser = argparse.ArgumentParser(description="Report cache hit-rates with and without query normalization.")
+    parser.add_argument("inputs", type=str, nargs="+", help="CSV files with a 'questions' column or transcript JSON files.")
+    parser.add_argument("--passes", type=int, default=1, help="Times the traffic is replayed (later passes hit in both caches).")
+    parser.add_argument("--show", action="store_true", help="Print the normalized text and key of every query.")
+    args = parser.parse_args()
+
+    queries = []
+    for input_path in args.inputs:
+        if input_path.endswith(".csv"):
+            df = pd.read_csv(input_path)
+            df.columns = [col.lower() for col in df.columns]
+            queries.extend(str(q) for q in df["questions"] if str(q).strip())
+        else:
+            queries.extend(get_user_queries(load_transcript(input_path)))
+
+    if args.show:
+        for query in queries:
+            normalized = normalize_query(query)
+            print(f"[{normalized.language:<8}] {query}\n           text: {normalized.text}\n           faq:  {normalized.faq_key}")
+    report = cache_hit_report(queries, args.passes)
+    print(f"{len(queries)} queries x {args.passes} passes")
+    for name, result in report.items():
+        languages = ", ".join(f"{language} {rate:.2f}" for language, rate in sorted(result["hit_rate_by_language"].items()))
+        print(f"{name:<11} hit-rate {result['hit_rate']:.3f}  distinct keys {result['distinct_keys']:>4}  ({languages})")
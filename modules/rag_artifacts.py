@@ -0,0 +1,277 @@
+import argparse
+import logging
+import os
+import pickle
+import shutil
+import threading
+import time
+from pathlib import Path
+import faiss
+from modules import metrics
+from modules.sparse_index import BM25Index
+from modules.embedding_store import ChunkEmbeddingStore, embeddings_from_faiss_index
+from modules.shards import SHARDS_DIR
+
+logger = logging.getLogger(__name__)
+
+# Layout of the RAG cache:
+#   rag_cache/CURRENT               name of the version being served
+#   rag_cache/versions/<version>/   rag_faiss.index, rag_content_chunks.pkl, rag_bm25.npz, rag_chunk_embeddings.*
+#   <version dir>/shards/<name>/     the same files for one document-type shard (optional, see modules/shards.py)
+# Caches without a CURRENT file are served from the flat rag_cache/ directory as version "legacy".
+CURRENT_FILE = "CURRENT"
+VERSIONS_DIR = "versions"
+LEGACY_VERSION = "legacy"
+ARTIFACT_FILES = ("rag_faiss.index", "rag_content_chunks.pkl", "rag_bm25.npz",
+                  "rag_chunk_embeddings.f16", "rag_chunk_embeddings.json")
+
+
+class RagArtifacts:
+    """One immutable, fully loaded version of the retrieval artifacts."""
+
+    def __init__(self, version, path, faiss_index, content_chunks, bm25_index=None, chunk_embeddings=None, shards=None):
+        self.version = version
+        self.path = path
+        self.faiss_index = faiss_index
+        self.content_chunks = content_chunks
+        self.bm25_index = bm25_index
+        self.chunk_embeddings = chunk_embeddings
+        self.shards = shards or {}  # shard name -> RagArtifacts
+        self.loaded_at = time.time()
+
+
+def resolve_current(cache_root):
+    """(version, directory) currently published under `cache_root`."""
+    cache_root = Path(cache_root)
+    current_file = cache_root / CURRENT_FILE
+    if current_file.exists():
+        version = current_file.read_text(encoding="utf-8").strip()
+        return version, cache_root / VERSIONS_DIR / version
+    return LEGACY_VERSION, cache_root
+
+
+def build_derived_artifacts(path, embedding_model_id=None):
+    """
+    Build and save the BM25 index and the chunk embedding store of the artifacts in
+    `path` (and of its shards) where they are missing. `publish_artifacts` runs this on
+    the staging directory, so a published version is complete and loading never writes.
+    The embedding store is only seeded from a flat FAISS index, tagged `embedding_model_id`.
+    """
+    path = Path(path)
+    with open(path / "rag_content_chunks.pkl", 'rb') as f:
+        content_chunks = pickle.load(f)
+    if not (path / "rag_bm25.npz").exists():
+        bm25_index = BM25Index.build(content_chunks)
+        bm25_index.save(path / "rag_bm25.npz")
+        logger.info("Built BM25 index at %s (%d terms).", path / "rag_bm25.npz", len(bm25_index.vocab))
+    if embedding_model_id and not ChunkEmbeddingStore.exists(path):
+        faiss_index = faiss.read_index(str(path / "rag_faiss.index"))
+        if faiss_index.ntotal == len(content_chunks) and isinstance(faiss_index, faiss.IndexFlat):
+            # A flat index holds the raw vectors, so the store can be seeded without re-embedding
+            chunk_embeddings = ChunkEmbeddingStore.save(
+                path, embeddings_from_faiss_index(faiss_index), embedding_model_id, content_chunks)
+            logger.info("Saved chunk embeddings to %s (%d x %d, float16).", path, len(chunk_embeddings), chunk_embeddings.meta["dim"])
+    shards_dir = path / SHARDS_DIR
+    if shards_dir.is_dir():
+        for shard_dir in sorted(p for p in shards_dir.iterdir() if p.is_dir()):
+            build_derived_artifacts(shard_dir, embedding_model_id)
+
+
+def load_artifact_dir(path, version, embedding_model_id, load_shards=True):
+    """
+    Load every artifact in `path` without writing to it: the directory may be a version
+    that another process is already serving. The FAISS index and content chunks are
+    required; a missing BM25 index or chunk embedding store is built in memory only
+    (`publish_artifacts` saves them with the version). Shards found under `path/shards/`
+    are loaded the same way.
+    """
+    path = Path(path)
+    faiss_index_path = path / "rag_faiss.index"
+    content_chunks_path = path / "rag_content_chunks.pkl"
+    bm25_index_path = path / "rag_bm25.npz"
+
+    if not faiss_index_path.exists():
+        raise FileNotFoundError(f"FAISS index file not found at {faiss_index_path}")
+    if not content_chunks_path.exists():
+        raise FileNotFoundError(f"Content chunks file not found at {content_chunks_path}")
+
+    faiss_index = faiss.read_index(str(faiss_index_path))
+    logger.info("Loaded FAISS index from %s with %d vectors.", faiss_index_path, faiss_index.ntotal)
+    with open(content_chunks_path, 'rb') as f:
+        content_chunks = pickle.load(f)
+    logger.info("Loaded content chunks from %s (%d chunks).", content_chunks_path, len(content_chunks))
+
+    if bm25_index_path.exists():
+        bm25_index = BM25Index.load(bm25_index_path)
+        logger.info("Loaded BM25 index from %s (%d terms).", bm25_index_path, len(bm25_index.vocab))
+    else:
+        # Older caches have no sparse index; publish them again to have it saved
+        bm25_index = BM25Index.build(content_chunks)
+        logger.warning("No BM25 index at %s; built one in memory (%d terms).", bm25_index_path, len(bm25_index.vocab))
+
+    chunk_embeddings = None
+    if ChunkEmbeddingStore.exists(path):
+        chunk_embeddings = ChunkEmbeddingStore.load(path)
+        if not chunk_embeddings.matches(content_chunks):
+            logger.warning("Stored chunk embeddings at %s do not match the content chunks; ignoring them.", path)
+            chunk_embeddings = None
+        else:
+            logger.info("Chunk embeddings memory-mapped (%d vectors, model %s).", len(chunk_embeddings), chunk_embeddings.model_id)
+    elif faiss_index.ntotal == len(content_chunks) and isinstance(faiss_index, faiss.IndexFlat):
+        # A flat index holds the raw vectors, so the store can be seeded without re-embedding
+        chunk_embeddings = ChunkEmbeddingStore.from_embeddings(
+            embeddings_from_faiss_index(faiss_index), embedding_model_id, content_chunks)
+        logger.info("Chunk embeddings taken from the flat FAISS index (%d vectors, model %s).", len(chunk_embeddings), chunk_embeddings.model_id)
+
+    shards = {}
+    shards_dir = path / SHARDS_DIR
+    if load_shards and shards_dir.is_dir():
+        for shard_dir in sorted(p for p in shards_dir.iterdir() if p.is_dir()):
+            shards[shard_dir.name] = load_artifact_dir(shard_dir, f"{version}/{shard_dir.name}", embedding_model_id, load_shards=False)
+        logger.info("Loaded %d shards: %s.", len(shards), ", ".join(shards))
+
+    return RagArtifacts(version, path, faiss_index, content_chunks, bm25_index, chunk_embeddings, shards)
+
+
+def publish_artifacts(source_dir, cache_root, version=None, embedding_model_id=None):
+    """
+    Publish the artifacts in `source_dir` as a new version and make it current.
+
+    The files are staged in a temporary directory, completed with the derived
+    artifacts (see `build_derived_artifacts`), and renamed into `versions/<version>`;
+    then CURRENT is replaced atomically, so a reader never sees a half-written version
+    and never has to write to one.
+    """
+    source_dir, cache_root = Path(source_dir), Path(cache_root)
+    version = version or time.strftime("%Y%m%d-%H%M%S")
+    versions_dir = cache_root / VERSIONS_DIR
+    target = versions_dir / version
+    if target.exists():
+        raise FileExistsError(f"Version {version} already exists at {target}")
+
+    staging = versions_dir / f".{version}.tmp"
+    staging.mkdir(parents=True)
+    copied = 0
+    for name in ARTIFACT_FILES:
+        if (source_dir / name).exists():
+            shutil.copy2(source_dir / name, staging / name)
+            copied += 1
+    if (source_dir / SHARDS_DIR).is_dir():
+        shutil.copytree(source_dir / SHARDS_DIR, staging / SHARDS_DIR)
+    if not (staging / "rag_faiss.index").exists() or not (staging / "rag_content_chunks.pkl").exists():
+        shutil.rmtree(staging)
+        raise FileNotFoundError(f"{source_dir} must contain rag_faiss.index and rag_content_chunks.pkl")
+    try:
+        build_derived_artifacts(staging, embedding_model_id)
+    except Exception:
+        shutil.rmtree(staging)
+        raise
+    os.rename(staging, target)
+
+    pointer_tmp = cache_root / f".{CURRENT_FILE}.tmp"
+    pointer_tmp.write_text(version, encoding="utf-8")
+    os.replace(pointer_tmp, cache_root / CURRENT_FILE)
+    logger.info("Published %d artifact files from %s as version %s.", copied, source_dir, version)
+    return version
+
+
+class ArtifactManager:
+    """
+    Serves the current RagArtifacts and swaps in new versions without a restart.
+
+    Readers call `current()` once per query and use that bundle throughout, so a
+    reload only replaces the reference: in-flight queries finish on the version
+    they started with while new queries see the new one.
+    """
+
+    def __init__(self, cache_root, embedding_model_id, on_swap=None):
+        self.cache_root = Path(cache_root)
+        self.embedding_model_id = embedding_model_id
+        self.on_swap = on_swap
+        self._current = None
+        # A version that failed to load is not retried by the watcher until another one is published
+        self._failed_version = None
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._stop_watching = threading.Event()
+
+    def current(self):
+        return self._current
+
+    def reload(self, force=False):
+        """Load the published version if it differs from the one served. Returns True if a swap happened."""
+        with self._reload_lock:
+            version, path = resolve_current(self.cache_root)
+            if not force and self._current is not None and self._current.version == version:
+                return False
+            logger.info("Loading RAG artifacts version %s from %s...", version, path)
+            start = time.perf_counter()
+            try:
+                artifacts = load_artifact_dir(path, version, self.embedding_model_id)
+            except Exception as e:
+                self._failed_version = version
+                metrics.increment("rag.reload_failures")
+                logger.error("Could not load RAG artifacts version %s: %s", version, e)
+                return False
+            elapsed = time.perf_counter() - start
+            self._failed_version = None
+
+            self._current = artifacts
+            metrics.observe("rag.reload_seconds", elapsed)
+            metrics.set_gauge("rag.version", version)
+            metrics.set_gauge("rag.chunks", len(artifacts.content_chunks))
+            logger.info("Now serving RAG artifacts version %s (loaded in %.2fs).", version, elapsed)
+            if self.on_swap:
+                self.on_swap(artifacts)
+            return True
+
+    def reload_async(self, force=False):
+        """Reload in a background thread; the old version keeps serving until the swap."""
+        thread = threading.Thread(target=self.reload, kwargs={"force": force}, daemon=True, name="rag-reload")
+        thread.start()
+        return thread
+
+    def start_watcher(self, interval=10.0):
+        """Poll the CURRENT pointer and reload whenever a new version is published."""
+        if self._watcher is not None:
+            return
+        self._stop_watching.clear()
+
+        def watch():
+            while not self._stop_watching.wait(interval):
+                version, _ = resolve_current(self.cache_root)
+                if version == self._failed_version:
+                    continue
+                if self._current is None or version != self._current.version:
+                    self.reload()
+
+        self._watcher = threading.Thread(target=watch, daemon=True, name="rag-watcher")
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop_watching.set()
+        self._watcher = None
+
+
+if __name__ == "__main__":
+    # Publish a freshly built set of artifacts; running apps pick it up without a restart:
+    #   python -m modules.rag_artifacts publish ./new_index_dir [--version 2025-03]
+    parser = argparse.ArgumentParser(description="Manage versions of the RAG artifacts.")
+    parser.add_argument("--cache_root", type=str, default="./rag_cache")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    publish_parser = subparsers.add_parser("publish", help="Publish a directory of artifacts as the current version.")
+    publish_parser.add_argument("source_dir", type=str)
+    publish_parser.add_argument("--version", type=str, default=None)
+    publish_parser.add_argument("--embedding_model_id", type=str, default=None,
+                                help="Model id recorded with the chunk embeddings seeded from a flat index (default: the torch query encoder's).")
+    subparsers.add_parser("current", help="Print the version currently published.")
+    args = parser.parse_args()
+
+    if args.command == "publish":
+        from modules.encoder import MODEL_NAME
+        embedding_model_id = args.embedding_model_id or f"{MODEL_NAME}@torch"
+        version = publish_artifacts(args.source_dir, args.cache_root, args.version, embedding_model_id)
+        print(f"Published {args.source_dir} as version {version}.")
+    else:
+        version, path = resolve_current(args.cache_root)
+        print(f"{version} ({path})")
@@ -0,0 +1,70 @@
+import os
+import time
+import torch
+from modules import metrics
+from modules.model_registry import registry, TORCH_DTYPES
+
+# Small multilingual cross-encoder (MiniLM, 12 layers x 384) trained on mMARCO
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+
+
+class CrossEncoderReranker:
+    """Scores (query, passage) pairs jointly, which ranks better than comparing separate embeddings."""
+
+    def __init__(self, model_name=RERANK_MODEL, precision="fp32", device="cpu", max_length=256):
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
+        self.model_name = model_name
+        # Dynamic int8 quantization only has CPU kernels
+        self.device = "cpu" if precision == "int8" else device
+        self.max_length = max_length
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        model.eval()
+        if precision == "int8":
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        elif precision in TORCH_DTYPES:
+            model = model.to(TORCH_DTYPES[precision])
+        self.model = model.to(self.device)
+
+    def score(self, query, passages):
+        """Relevance score of each passage for the query (higher is better)."""
+        inputs = self.tokenizer([query] * len(passages), passages, padding=True, truncation=True,
+                                max_length=self.max_length, return_tensors="pt").to(self.device)
+        with torch.inference_mode():
+            logits = self.model(**inputs).logits
+        return logits[:, 0].float().cpu().tolist()
+
+
+# Runs on the CPU next to the query encoder; MODEL_PRECISION_RERANKER=int8 quantizes it.
+# Never unloaded when idle: reloading it would land inside a turn.
+registry.register("reranker", lambda precision, device: CrossEncoderReranker(precision=precision, device=device),
+                  device="cpu", idle_timeout=None)
+
+
+def rerank(query, passages, top_n, batch_size=4, time_cap_s=0.3):
+    """
+    Positions of the `top_n` most relevant `passages`, best first.
+
+    Passages are scored in small batches in their first-stage order. Before each
+    batch, including the first, the batch is only started if it is expected to finish
+    within `time_cap_s` (judged by the slowest batch so far), so the best first-stage
+    candidates are re-scored first and the unscored rest keep their first-stage order
+    behind them. With no time left nothing is scored and the first-stage order is kept.
+    """
+    if len(passages) <= 1 or time_cap_s <= 0:
+        return list(range(min(top_n, len(passages))))
+    reranker = registry.get("reranker")
+    start = time.perf_counter()
+    scores = []
+    slowest_batch = 0.0
+    for batch_start in range(0, len(passages), batch_size):
+        if time.perf_counter() - start + slowest_batch > time_cap_s:
+            metrics.increment("rerank.time_capped")
+            break
+        batch_started = time.perf_counter()
+        scores.extend(reranker.score(query, passages[batch_start:batch_start + batch_size]))
+        slowest_batch = max(slowest_batch, time.perf_counter() - batch_started)
+    metrics.observe("rerank.seconds", time.perf_counter() - start)
+
+    scored = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+    return (scored + list(range(len(scores), len(passages))))[:top_n]
@@ -1,13 +1,27 @@
 import os
-import torch
-import faiss
+import logging
+import threading
 import numpy as np
-from transformers import AutoTokenizer, AutoModel
 from groq import Groq
 from pathlib import Path
-import pickle
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from collections import OrderedDict
 import pandas as pd
 from dotenv import load_dotenv
+from modules.sparse_index import reciprocal_rank_fusion
+from modules.context_packer import pack_context
+from modules.encoder import encoder_from_env, MODEL_NAME
+from modules.embedding_store import query_embedding_cache
+from modules.rag_artifacts import ArtifactManager
+from modules.shards import route_shards
+from modules.parallel_inference import answer_in_parallel, fork_available
+from modules.model_registry import registry
+from modules.deadline import TTS_RESERVE_SECONDS, LLM_MIN_SECONDS, FILLER_TEXT
+from modules.faq import faq_answer
+from modules.reranker import rerank
+from modules.query_normalizer import retrieval_text, cache_key
+
+logger = logging.getLogger(__name__)
 
 # --- Global Configuration & Model Initialization ---
 load_dotenv()
@@ -16,94 +30,266 @@ if not GROQ_API_KEY:
     raise ValueError("GROQ_API_KEY not found in environment variables. Please set it in your .env file.")
 client = Groq(api_key=GROQ_API_KEY)
 llama_model = "llama-3.3-70b-versatile" 
+# Upper bound on an LLM request made without a turn deadline (CSV inference, evaluation)
+GROQ_TIMEOUT_SECONDS = float(os.getenv("GROQ_TIMEOUT_SECONDS", "30"))
+
+# Retrieval mode: "hybrid" (BM25 + dense, fused with RRF), "dense" or "sparse"
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+# Candidates taken from each ranked list before reciprocal-rank fusion
+RRF_CANDIDATES = 20
+# Maximum number of context tokens sent to the LLM after deduplication and boilerplate stripping
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1024"))
+# Optional cross-encoder re-ranking (RERANK=1): over-fetch RERANK_CANDIDATES chunks, re-score them
+# for at most RERANK_TIME_CAP_MS (less when the turn's deadline is closer) and keep the best RERANK_TOP_N
+RERANK = os.getenv("RERANK", "0") == "1"
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "3"))
+RERANK_TIME_CAP_MS = float(os.getenv("RERANK_TIME_CAP_MS", "300"))
 
-# Initialize tokenizer and embedding model globally
+# Initialize the query encoder globally; ENCODER_BACKEND picks torch, torch-int8, onnx or onnx-int8
+# and TORCH_NUM_THREADS the intra-op thread count (see modules/encoder.py). It is needed for
+# every query, so it is registered without an idle timeout and only appears in the memory report.
+registry.register("query_encoder", lambda precision, device: encoder_from_env(),
+                  precision="int8" if os.getenv("ENCODER_BACKEND", "torch").endswith("int8") else "fp32",
+                  device="cpu", idle_timeout=None)
 try:
-    tokenizer = AutoTokenizer.from_pretrained("sentence-transformers/all-mpnet-base-v2")
-    embedding_model = AutoModel.from_pretrained("sentence-transformers/all-mpnet-base-v2")
-    EMBEDDING_DIM = embedding_model.config.hidden_size
+    query_encoder = registry.get("query_encoder")
+    EMBEDDING_DIM = query_encoder.hidden_size
+    logger.info("Query encoder ready (%s backend).", query_encoder.backend)
 except Exception as e:
-    print(f"Error initializing HuggingFace models: {e}")
-    print("Please ensure you have an internet connection and the model name is correct.")
-    tokenizer = None
-    embedding_model = None
+    logger.error("Error initializing HuggingFace models: %s. Please ensure you have an internet connection "
+                 "and the model name is correct.", e)
+    query_encoder = None
     EMBEDDING_DIM = 768 # Default, but will cause issues if model not loaded
 
-# Global variables for RAG artifacts
+if RERANK:
+    # Loaded up front (and pinned by the registry) so no turn pays for loading the cross-encoder
+    try:
+        registry.get("reranker")
+    except Exception as e:
+        logger.error("Could not load the re-ranker, re-ranking will fall back to the first-stage order: %s", e)
+
+# Global variables for RAG artifacts. They mirror the version currently served by
+# artifact_manager; query code takes one artifact_manager.current() snapshot instead.
 faiss_index = None
 content_chunks = None
+bm25_index = None
+chunk_embeddings = None
 rag_artifacts_loaded = False
 
-# --- RAG Artifact Loading ---
-def load_rag_artifacts():
-    global faiss_index, content_chunks, rag_artifacts_loaded
-    current_script_dir = Path("./rag_cache")
-    faiss_index_path = current_script_dir / "rag_faiss.index"
-    content_chunks_path = current_script_dir / "rag_content_chunks.pkl"
+# Repeated queries skip the encoder entirely; spelling and script variants of a query
+# share an entry through query_normalizer.cache_key. query_embedding_cache (imported
+# above) is shared with the sentiment head in modules/intent_recognition.py.
 
-    print("Attempting to load RAG artifacts...")
-    try:
-        if faiss_index_path.exists():
-            faiss_index = faiss.read_index(str(faiss_index_path))
-            print(f"Successfully loaded FAISS index from {faiss_index_path} with {faiss_index.ntotal} vectors.")
-        else:
-            print(f"Error: FAISS index file not found at {faiss_index_path}")
-            faiss_index = None
+# Recent LLM answers, replayed when a repeated question cannot be answered within its deadline
+ANSWER_CACHE_SIZE = 1024
+answer_cache = OrderedDict()
+answer_cache_lock = threading.Lock()
 
-        if content_chunks_path.exists():
-            with open(content_chunks_path, 'rb') as f:
-                content_chunks = pickle.load(f)
-            print(f"Successfully loaded content chunks from {content_chunks_path} ({len(content_chunks)} chunks).")
-        else:
-            print(f"Error: Content chunks file not found at {content_chunks_path}")
-            content_chunks = None
-            
-        if faiss_index is not None and content_chunks is not None:
-            rag_artifacts_loaded = True
-            print("RAG artifacts loaded successfully.")
-        else:
-            rag_artifacts_loaded = False
-            print("Failed to load one or more RAG artifacts. RAG functions will not operate correctly.")
+# Dense and sparse lookups run side by side (FAISS and torch release the GIL)
+retrieval_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="retrieval")
+# Fan-out over shards when a query is routed to more than one of them
+shard_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="shard")
 
-    except Exception as e:
-        print(f"An error occurred while loading RAG artifacts: {e}")
-        faiss_index = None
-        content_chunks = None
+# --- RAG Artifact Loading ---
+def _expose_artifacts(artifacts):
+    global faiss_index, content_chunks, bm25_index, chunk_embeddings, rag_artifacts_loaded
+    faiss_index = artifacts.faiss_index
+    content_chunks = artifacts.content_chunks
+    bm25_index = artifacts.bm25_index
+    chunk_embeddings = artifacts.chunk_embeddings
+    rag_artifacts_loaded = True
+
+# The chunk embeddings of the shipped cache come from the fp32 torch encoder
+artifact_manager = ArtifactManager(Path("./rag_cache"), f"{MODEL_NAME}@torch", on_swap=_expose_artifacts)
+
+def load_rag_artifacts():
+    global rag_artifacts_loaded
+    logger.info("Attempting to load RAG artifacts...")
+    artifact_manager.reload(force=True)
+    if artifact_manager.current() is not None:
+        logger.info("RAG artifacts loaded successfully.")
+    else:
         rag_artifacts_loaded = False
+        logger.error("Failed to load one or more RAG artifacts. RAG functions will not operate correctly.")
+
+def reload_rag_artifacts(background=True):
+    """
+    Switch to the most recently published artifact version, if it changed.
+    Queries already running keep using the version they started with.
+    """
+    if background:
+        return artifact_manager.reload_async()
+    return artifact_manager.reload()
+
+def start_artifact_watcher(interval=10.0):
+    """Reload automatically whenever a new version is published (see modules/rag_artifacts.py)."""
+    artifact_manager.start_watcher(interval)
 
 # Load artifacts when the module is imported/run
 load_rag_artifacts()
 
 # --- Core RAG Functions ---
-def get_bot_response(query: str) -> str:
+def dense_search(query: str, k: int, artifacts=None) -> list:
+    """Chunk ids of the k nearest chunks to the query embedding in the FAISS index, best first."""
+    artifacts = artifacts or artifact_manager.current()
+    query_embedding = query_embedding_cache.get_or_compute(query_encoder.model_id, query, query_encoder.encode, key=cache_key(query))
+    distances, indices = artifacts.faiss_index.search(query_embedding, k)
+    return [int(i) for i in indices[0] if 0 <= i < len(artifacts.content_chunks)]
+
+def sparse_search(query: str, k: int, artifacts=None) -> list:
+    """Chunk ids of the k best BM25 matches for the query, best first."""
+    artifacts = artifacts or artifact_manager.current()
+    if artifacts.bm25_index is None:
+        return []
+    indices, _ = artifacts.bm25_index.search(query, k)
+    return [int(i) for i in indices]
+
+def retrieve_chunk_ids(query: str, k: int = 5, mode: str = None, artifacts=None, deadline=None) -> list:
+    """
+    Returns the ids of the top-k content chunks for a query.
+    The query is searched in its normalized form (see modules/query_normalizer.py), so Devanagari
+    and Hinglish spellings match the same BM25 terms.
+    In hybrid mode the FAISS and BM25 lookups run concurrently and are merged with reciprocal-rank fusion.
+    With a `deadline`, a dense lookup that would leave the LLM less than LLM_MIN_SECONDS is not
+    waited for and the BM25 ranking is used on its own.
+    """
+    query = retrieval_text(query)
+    mode = mode or RETRIEVAL_MODE
+    artifacts = artifacts or artifact_manager.current()
+    k = min(k, len(artifacts.content_chunks))
+    if k == 0:
+        return []
+
+    if mode == "dense" or artifacts.bm25_index is None:
+        return dense_search(query, k, artifacts)
+    if mode == "sparse":
+        return sparse_search(query, k, artifacts)
+
+    candidates = min(max(k, RRF_CANDIDATES), len(artifacts.content_chunks))
+    dense_future = retrieval_executor.submit(dense_search, query, candidates, artifacts)
+    sparse_future = retrieval_executor.submit(sparse_search, query, candidates, artifacts)
+    sparse_ids = sparse_future.result()
+    try:
+        dense_ids = dense_future.result(
+            timeout=None if deadline is None else max(0.0, deadline.budget(reserve=LLM_MIN_SECONDS + TTS_RESERVE_SECONDS)))
+    except FuturesTimeoutError:
+        # The lookup finishes in the background and still fills the query embedding cache
+        deadline.fallback("sparse_only")
+        return sparse_ids[:k]
+    return reciprocal_rank_fusion([dense_ids, sparse_ids], k)
+
+def retrieve_sharded(query: str, k: int, artifacts, intents: list = None, shards: list = None, deadline=None) -> list:
+    """
+    Returns the top-k content chunks from the shards the query is routed to (see modules/shards.py).
+    Several shards are searched in parallel and their rankings merged with reciprocal-rank fusion.
+    """
+    names = route_shards(artifacts.shards, intents, shards)
+    if len(names) == 1:
+        shard = artifacts.shards[names[0]]
+        return [shard.content_chunks[i] for i in retrieve_chunk_ids(query, k, artifacts=shard, deadline=deadline)]
+
+    futures = {name: shard_executor.submit(retrieve_chunk_ids, query, k, None, artifacts.shards[name], deadline) for name in names}
+    rankings = [[(name, i) for i in future.result()] for name, future in futures.items()]
+    return [artifacts.shards[name].content_chunks[i] for name, i in reciprocal_rank_fusion(rankings, k)]
+
+def retrieve_context(query: str, k: int = 5, intents: list = None, shards: list = None, use_rerank: bool = None, deadline=None) -> list:
+    """
+    Returns the top-k content chunks for a query.
+    Split out of get_bot_response so it can also be run speculatively on partial transcripts.
+    With detected `intents` or an explicit `shards` filter the query only searches the matching shards;
+    otherwise, or when no shards were built, the full index is searched.
+    With re-ranking (RERANK, or `use_rerank`) RERANK_CANDIDATES chunks are fetched and the
+    cross-encoder's best RERANK_TOP_N are returned instead. Re-ranking gets at most
+    RERANK_TIME_CAP_MS, and never more than leaves LLM_MIN_SECONDS plus the TTS reserve of the deadline.
+    `deadline` is the turn's budget (modules/deadline.py); retrieval cuts slow lookups short to honour it.
+    """
+    if RERANK if use_rerank is None else use_rerank:
+        candidates = retrieve_context(query, max(k, RERANK_CANDIDATES), intents, shards, use_rerank=False, deadline=deadline)
+        time_cap_s = RERANK_TIME_CAP_MS / 1000
+        if deadline is not None:
+            time_cap_s = min(time_cap_s, deadline.budget(reserve=LLM_MIN_SECONDS + TTS_RESERVE_SECONDS))
+            if time_cap_s <= 0:
+                deadline.fallback("skip_rerank")
+        try:
+            order = rerank(query, candidates, RERANK_TOP_N, time_cap_s=time_cap_s)
+        except Exception as e:
+            logger.error("Re-ranking failed, using the first-stage ranking: %s", e)
+            order = range(min(k, len(candidates)))
+        return [candidates[i] for i in order]
+
+    # One snapshot per query, so a concurrent reload cannot mix ids and chunks of two versions
+    artifacts = artifact_manager.current()
+    if artifacts is None or query_encoder is None:
+        return []
+    if not query or not query.strip():
+        return []
+
+    if artifacts.shards and (intents or shards):
+        return retrieve_sharded(query, k, artifacts, intents, shards, deadline)
+    return [artifacts.content_chunks[i] for i in retrieve_chunk_ids(query, k, artifacts=artifacts, deadline=deadline)]
+
+def _remember_answer(query: str, answer: str):
+    key = cache_key(query)
+    with answer_cache_lock:
+        answer_cache[key] = answer
+        answer_cache.move_to_end(key)
+        while len(answer_cache) > ANSWER_CACHE_SIZE:
+            answer_cache.popitem(last=False)
+
+def fallback_answer(query: str, deadline) -> str:
+    """Answer without the LLM: a cached answer to the same question, the FAQ, or the filler line."""
+    with answer_cache_lock:
+        answer = answer_cache.get(cache_key(query))
+    if answer:
+        deadline.fallback("answer_cache")
+        return answer
+    answer = faq_answer(query)
+    if answer:
+        deadline.fallback("faq")
+        return answer
+    deadline.fallback("filler")
+    return FILLER_TEXT
+
+def get_bot_response(query: str, contexts: list = None, intents: list = None, shards: list = None, deadline=None) -> str:
     """
     Generates a RAG response for a given query using pre-loaded artifacts.
-    Uses global client, llama_model, tokenizer, embedding_model, faiss_index, content_chunks.
+    Uses global client, llama_model, query_encoder and the artifacts served by artifact_manager.
+    If `contexts` is given (e.g. pre-fetched from a partial transcript) the retrieval step is skipped;
+    `intents` / `shards` route retrieval to the matching document-type shards.
+    With a `deadline` (modules/deadline.py) the LLM call is capped to the turn's remaining budget,
+    and a timeout or error is answered by `fallback_answer` instead of an error message.
     """
-    if not rag_artifacts_loaded or tokenizer is None or embedding_model is None or faiss_index is None or content_chunks is None:
+    artifacts = artifact_manager.current()
+    if artifacts is None or query_encoder is None:
         return "Error: RAG components are not properly loaded. Cannot generate response."
     if not query or not query.strip():
         return "Error: Query cannot be empty."
 
     try:
-        query_inputs = tokenizer(query, return_tensors='pt', truncation=True, padding=True)
-        
-        with torch.no_grad():
-            query_embedding = embedding_model(**query_inputs).last_hidden_state.mean(dim=1).detach().numpy()
-        
-        k = min(5, len(content_chunks)) 
-        if k == 0:
-            return "No content available in loaded chunks to search."
-            
-        distances, indices = faiss_index.search(query_embedding, k)
-        
-        relevant_contexts = [content_chunks[i] for i in indices[0] if i < len(content_chunks)]
-        combined_context = " ".join(relevant_contexts)
+        if contexts is None:
+            if len(artifacts.content_chunks) == 0:
+                return "No content available in loaded chunks to search."
+            contexts = retrieve_context(query, intents=intents, shards=shards, deadline=deadline)
+            if deadline is not None:
+                deadline.check("retrieval")
+
+        combined_context, packing_stats = pack_context(contexts, CONTEXT_TOKEN_BUDGET)
+        logger.debug("Context packing: %d -> %d prompt tokens", packing_stats["original_tokens"],
+                     packing_stats["packed_tokens"], extra={"context_packing": packing_stats})
 
         if not combined_context.strip():
             return "Could not find relevant context for your query in the loaded documents."
+        if deadline is not None and deadline.expired():
+            raise TimeoutError("turn deadline passed before the LLM call")
 
-        chat_completion = client.chat.completions.create(
+        if deadline is not None:
+            # A single attempt: the SDK's retries would each get the full timeout again, so a slow
+            # backend could hold the turn for (1 + max_retries) times the remaining budget
+            llm = client.with_options(max_retries=0, timeout=deadline.timeout(reserve=TTS_RESERVE_SECONDS))
+        else:
+            llm = client.with_options(timeout=GROQ_TIMEOUT_SECONDS)
+        chat_completion = llm.chat.completions.create(
             messages=[
                 {
                     "role": "system",
@@ -124,58 +310,84 @@ Keep your answers concise, clear, and helpful."""
             model=llama_model,
         )
         answer = chat_completion.choices[0].message.content
+        _remember_answer(query, answer)
+        if deadline is not None:
+            deadline.check("llm")
         return answer
     except Exception as e:
-        print(f"Error during RAG response generation for query '{query}': {e}")
+        logger.error("Error during RAG response generation: %s", e, extra={"query": query})
+        if deadline is not None:
+            deadline.check("llm")
+            return fallback_answer(query, deadline)
         return "Error generating response from LLM."
 
-def generate_csv_with_answers(input_csv_path: str, output_csv_path: str):
+def _answer_or_skip(question: str) -> str:
+    if not question.strip():
+        return "Skipped empty question."
+    return get_bot_response(question)
+
+def _init_inference_worker(threads: int):
+    # ONNX Runtime is not fork-safe: each worker opens its own session, sized to its share of the threads
+    if query_encoder is not None and query_encoder.session is not None:
+        query_encoder.reopen_onnx_session(threads)
+
+def generate_csv_with_answers(input_csv_path: str, output_csv_path: str, workers: int = 1, threads_per_worker: int = None):
     """
     Reads questions from an input CSV, generates answers using get_bot_response,
     and writes questions and answers to an output CSV.
-    Uses global RAG components.
+    Uses global RAG components. With workers > 1 the questions are answered by a pool
+    of forked processes that share the loaded models and indexes (see modules/parallel_inference.py).
     """
     if not rag_artifacts_loaded:
-        print("Error: RAG components are not loaded. Cannot process CSV.")
+        logger.error("RAG components are not loaded. Cannot process CSV.")
         return
 
     try:
         df = pd.read_csv(input_csv_path)
         df.columns = [col.lower() for col in df.columns]
         if 'questions' not in df.columns:
-            print(f"Error: 'questions' column not found in {input_csv_path}")
+            logger.error("'questions' column not found in %s", input_csv_path)
             return
     except FileNotFoundError:
-        print(f"Error: Input CSV file not found at {input_csv_path}.")
+        logger.error("Input CSV file not found at %s.", input_csv_path)
         return
     except Exception as e:
-        print(f"Error reading CSV {input_csv_path}: {e}")
+        logger.error("Error reading CSV %s: %s", input_csv_path, e)
         return
 
     answers = []
     total_questions = len(df)
-    print(f"Processing {total_questions} questions from {input_csv_path}...")
-    
-    for i, row in df.iterrows():
-        question = str(row['questions']) 
-        if not question.strip():
-            print(f"Skipping empty question at row {i+1}.")
-            answers.append("Skipped empty question.")
-            continue
-
-        print(f"Processing question {i+1}/{total_questions}: \"{question[:70]}...\"")
-        
-        answer = get_bot_response(question)
-        answers.append(answer)
-        print(f"  -> Answer generated: \"{str(answer)[:70]}...\"")
+    logger.info("Processing %d questions from %s...", total_questions, input_csv_path)
+
+    if workers > 1 and not fork_available():
+        logger.warning("Parallel inference needs the 'fork' start method; falling back to a single process.")
+        workers = 1
+
+    if workers > 1:
+        questions = [str(q) for q in df['questions']]
+        answers = answer_in_parallel(_answer_or_skip, questions, workers, threads_per_worker, worker_setup=_init_inference_worker)
+    else:
+        for i, row in df.iterrows():
+            question = str(row['questions']) 
+            if not question.strip():
+                logger.info("Skipping empty question at row %d.", i + 1)
+                answers.append("Skipped empty question.")
+                continue
+
+            logger.info("Processing question %d/%d", i + 1, total_questions, extra={"question": question[:70]})
+            
+            answer = get_bot_response(question)
+            answers.append(answer)
+            # Answers can be several KB; the full text only goes to the output CSV
+            logger.debug("Answer generated", extra={"answer_preview": str(answer)[:70], "answer_chars": len(str(answer))})
 
     df['answers'] = answers
 
     try:
         df.to_csv(output_csv_path, index=False, encoding='utf-8')
-        print(f"Successfully processed questions and saved results to {output_csv_path}")
+        logger.info("Successfully processed questions and saved results to %s", output_csv_path)
     except Exception as e:
-        print(f"Error writing CSV to {output_csv_path}: {e}")
+        logger.error("Error writing CSV to %s: %s", output_csv_path, e)
 
 # Example usage (optional, can be commented out or removed if this is purely a library)
 # if __name__ == "__main__":
@@ -0,0 +1,129 @@
+import argparse
+import json
+from pathlib import Path
+import numpy as np
+
+SENTIMENT_HEAD_PATH = Path("./rag_cache/sentiment_head.npz")
+SENTIMENT_LABELS = ("NEGATIVE", "NEUTRAL", "POSITIVE")
+
+
+def _normalize(embeddings):
+    embeddings = np.atleast_2d(embeddings).astype(np.float32)
+    return embeddings / np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-9, None)
+
+
+def _softmax(logits):
+    logits = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+class SentimentHead:
+    """
+    Multinomial logistic regression over the query embedding. Predicting sentiment
+    is one matrix product on an embedding retrieval has already computed, instead
+    of a forward pass through a separate sentiment transformer.
+    """
+
+    def __init__(self, weights, bias, model_id, labels=SENTIMENT_LABELS):
+        self.weights = weights.astype(np.float32)
+        self.bias = bias.astype(np.float32)
+        self.model_id = model_id
+        self.labels = tuple(labels)
+
+    @classmethod
+    def fit(cls, embeddings, labels, model_id, epochs=300, learning_rate=0.5, l2=1e-3):
+        """Fit on (n, dim) embeddings and their sentiment labels with full-batch gradient descent."""
+        embeddings = _normalize(embeddings)
+        targets = np.zeros((len(labels), len(SENTIMENT_LABELS)), dtype=np.float32)
+        targets[np.arange(len(labels)), [SENTIMENT_LABELS.index(label) for label in labels]] = 1.0
+        weights = np.zeros((embeddings.shape[1], len(SENTIMENT_LABELS)), dtype=np.float32)
+        bias = np.zeros(len(SENTIMENT_LABELS), dtype=np.float32)
+        for _ in range(epochs):
+            error = (_softmax(embeddings @ weights + bias) - targets) / len(embeddings)
+            weights -= learning_rate * (embeddings.T @ error + l2 * weights)
+            bias -= learning_rate * error.sum(axis=0)
+        return cls(weights, bias, model_id)
+
+    def predict(self, embeddings):
+        """(labels, scores) for a (dim,) or (n, dim) array of query embeddings."""
+        probabilities = _softmax(_normalize(embeddings) @ self.weights + self.bias)
+        best = probabilities.argmax(axis=1)
+        return [self.labels[i] for i in best], [float(probabilities[row, i]) for row, i in enumerate(best)]
+
+    def save(self, path=SENTIMENT_HEAD_PATH):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(path, weights=self.weights, bias=self.bias, model_id=self.model_id, labels=np.array(self.labels))
+
+    @classmethod
+    def load(cls, path=SENTIMENT_HEAD_PATH):
+        data = np.load(path)
+        return cls(data["weights"], data["bias"], str(data["model_id"]), [str(label) for label in data["labels"]])
+
+
+def teacher_labels(queries):
+    """Sentiment labels from the XLM-R sentiment model the head replaces."""
+    from modules.model_registry import registry
+    import modules.intent_recognition  # noqa: F401 (registers the sentiment model)
+    results = registry.get("sentiment")(queries, batch_size=32)
+    return [result["label"].upper() for result in results]
+
+
+def load_queries(paths):
+    """User queries from CSV files with a 'questions' column or transcript JSON files, without duplicates."""
+    import pandas as pd
+    from modules.intent_recognition import load_transcript, get_user_queries
+    queries = []
+    for input_path in paths:
+        if input_path.endswith(".csv"):
+            df = pd.read_csv(input_path)
+            df.columns = [col.lower() for col in df.columns]
+            queries.extend(str(q) for q in df["questions"] if str(q).strip())
+        else:
+            queries.extend(get_user_queries(load_transcript(input_path)))
+    return list(dict.fromkeys(queries))
+
+
+def agreement(head, embeddings, labels):
+    predicted, _ = head.predict(embeddings)
+    return sum(p == t for p, t in zip(predicted, labels)) / len(labels)
+
+
+if __name__ == "__main__":
+    # Distil the sentiment model into a head over the query encoder's embeddings:
+    #   python -m modules.sentiment_head data/test.csv transcripts/*.json [--holdout_inputs held_out.csv]
+    parser = argparse.ArgumentParser(description="Train the linear sentiment head on the query embeddings.")
+    parser.add_argument("inputs", type=str, nargs="+", help="CSV files with a 'questions' column or transcript JSON files.")
+    parser.add_argument("--holdout_inputs", type=str, nargs="*", default=None,
+                        help="Queries to report agreement on instead of training on (default: a random --holdout_fraction of the inputs).")
+    parser.add_argument("--holdout_fraction", type=float, default=0.25, help="Share of the inputs held out when no --holdout_inputs are given.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=str, default=str(SENTIMENT_HEAD_PATH))
+    args = parser.parse_args()
+
+    from modules.model_registry import registry
+    from modules.intent_recognition import embed_queries
+
+    queries = load_queries(args.inputs)
+    if args.holdout_inputs:
+        held_out = [query for query in load_queries(args.holdout_inputs) if query not in set(queries)]
+    else:
+        order = np.random.default_rng(args.seed).permutation(len(queries))
+        n_held_out = int(round(len(queries) * args.holdout_fraction))
+        held_out = [queries[i] for i in order[:n_held_out]]
+        queries = [queries[i] for i in sorted(order[n_held_out:])]
+    print(f"Labelling {len(queries)} training and {len(held_out)} held-out queries with the sentiment model...")
+    labels = teacher_labels(queries)
+    print(f"Label counts: {json.dumps({label: labels.count(label) for label in SENTIMENT_LABELS})}")
+
+    # Embedded exactly as at inference time (normalized query text, shared encoder)
+    embeddings = embed_queries(queries)
+    head = SentimentHead.fit(embeddings, labels, registry.get("query_encoder").model_id)
+    head.save(args.output)
+    print(f"Saved sentiment head to {args.output}.")
+    print(f"Agreement with the sentiment model: {agreement(head, embeddings, labels):.3f} on the training queries", end="")
+    if held_out:
+        print(f", {agreement(head, embed_queries(held_out), teacher_labels(held_out)):.3f} on {len(held_out)} held-out queries.")
+    else:
+        print("; no queries were held out.")
@@ -0,0 +1,134 @@
+import argparse
+import fnmatch
+import logging
+import pickle
+import re
+from pathlib import Path
+import faiss
+from modules.sparse_index import BM25Index
+from modules.embedding_store import ChunkEmbeddingStore, embeddings_from_faiss_index
+
+logger = logging.getLogger(__name__)
+
+SHARDS_DIR = "shards"
+
+# Which source PDFs go into which shard (fnmatch patterns on the file name)
+SHARD_SOURCES = {
+    "factsheets": ["FACTSHEET-*"],
+    "regulatory": ["RBI Document*", "PPT to explain RBI Circular*", "P2P-Landscape*"],
+    "product": ["Instructions*"],
+    "company": ["*LinkedIn*"],
+}
+
+# Shards searched for each intent from intent_recognition.INTENTS. Intents that are
+# not listed (greeting, acknowledgment, inquiry, ...) search every shard.
+INTENT_SHARDS = {
+    "connection_issue": ["product"],
+    "callback_inquiry": ["product"],
+    "guidance_request": ["product", "regulatory"],
+    "loan_limit_inquiry": ["regulatory", "product"],
+    "credit_score_inquiry": ["regulatory", "product"],
+    "platform_inquiry": ["product", "factsheets", "company"],
+    "account_inquiry": ["product"],
+    "representation": ["company", "product"],
+}
+
+_PAGE_MARKER_RE = re.compile(r"--- Page \d+ of (.+?) ---")
+
+
+def assign_chunk_sources(chunks):
+    """
+    Source PDF of every chunk. Only the first chunk of each page carries the
+    "--- Page N of <file> ---" marker, so the last seen file name is carried forward.
+    """
+    sources = []
+    current = None
+    for chunk in chunks:
+        markers = _PAGE_MARKER_RE.findall(chunk)
+        if markers:
+            current = markers[-1]
+        sources.append(current)
+    return sources
+
+
+def shard_for_source(source):
+    if source is None:
+        return None
+    for shard, patterns in SHARD_SOURCES.items():
+        if any(fnmatch.fnmatch(source, pattern) for pattern in patterns):
+            return shard
+    return None
+
+
+def route_shards(available, intents=None, shards=None):
+    """
+    Shards to search for a query: an explicit `shards` filter wins, otherwise the
+    union of the shards mapped from the detected `intents`, otherwise all of them.
+    """
+    if shards:
+        selected = [name for name in shards if name in available]
+        return selected or sorted(available)
+    if intents:
+        selected = []
+        for intent in intents:
+            if intent not in INTENT_SHARDS:
+                return sorted(available)
+            selected.extend(name for name in INTENT_SHARDS[intent] if name in available and name not in selected)
+        if selected:
+            return selected
+    return sorted(available)
+
+
+def build_shards(artifact_dir):
+    """
+    Split the artifacts in `artifact_dir` into per-document-type shards under
+    `artifact_dir/shards/<name>/`. Vectors come from the existing flat index (or the
+    chunk embedding store), so nothing is re-embedded.
+    """
+    artifact_dir = Path(artifact_dir)
+    with open(artifact_dir / "rag_content_chunks.pkl", "rb") as f:
+        chunks = pickle.load(f)
+    index = faiss.read_index(str(artifact_dir / "rag_faiss.index"))
+    store = ChunkEmbeddingStore.load(artifact_dir) if ChunkEmbeddingStore.exists(artifact_dir) else None
+    if isinstance(index, faiss.IndexFlat):
+        vectors = embeddings_from_faiss_index(index)
+    elif store is not None:
+        vectors = store.get(list(range(len(chunks))))
+    else:
+        raise ValueError(f"{artifact_dir} has neither a flat FAISS index nor stored chunk embeddings to shard.")
+    model_id = store.model_id if store is not None else "unknown"
+
+    members = {}
+    unassigned = 0
+    for chunk_id, source in enumerate(assign_chunk_sources(chunks)):
+        shard = shard_for_source(source)
+        if shard is None:
+            unassigned += 1
+            continue
+        members.setdefault(shard, []).append(chunk_id)
+
+    for shard, chunk_ids in members.items():
+        shard_dir = artifact_dir / SHARDS_DIR / shard
+        shard_dir.mkdir(parents=True, exist_ok=True)
+        shard_chunks = [chunks[i] for i in chunk_ids]
+        shard_index = faiss.IndexFlatL2(vectors.shape[1])
+        shard_index.add(vectors[chunk_ids])
+        faiss.write_index(shard_index, str(shard_dir / "rag_faiss.index"))
+        with open(shard_dir / "rag_content_chunks.pkl", "wb") as f:
+            pickle.dump(shard_chunks, f)
+        BM25Index.build(shard_chunks).save(shard_dir / "rag_bm25.npz")
+        ChunkEmbeddingStore.save(shard_dir, vectors[chunk_ids], model_id, shard_chunks)
+        logger.info("Built shard '%s' with %d chunks at %s", shard, len(chunk_ids), shard_dir)
+    if unassigned:
+        logger.warning("%d chunks did not match any shard and were left out of the shards.", unassigned)
+    return {shard: len(chunk_ids) for shard, chunk_ids in members.items()}
+
+
+if __name__ == "__main__":
+    # Split an artifact directory into shards:
+    #   python -m modules.shards ./rag_cache
+    parser = argparse.ArgumentParser(description="Build per-document-type shards from the RAG artifacts.")
+    parser.add_argument("artifact_dir", type=str, nargs="?", default="./rag_cache")
+    args = parser.parse_args()
+    for shard, count in build_shards(args.artifact_dir).items():
+        print(f"Built shard '{shard}' with {count} chunks.")
@@ -0,0 +1,146 @@
+import os
+import pickle
+import re
+import sys
+from collections import Counter
+from pathlib import Path
+import numpy as np
+
+# Dotted / slashed identifiers (RBI circular numbers such as "DNBR.PD.CC.No.090/03.10.001")
+# are indexed as a whole token as well as their parts, so exact references still match.
+_COMPOUND_RE = re.compile(r"\w+(?:[./-]\w+)+", re.UNICODE)
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    """Lowercased word tokens plus whole dotted/slashed identifiers."""
+    text = text.lower()
+    tokens = _WORD_RE.findall(text)
+    tokens.extend(_COMPOUND_RE.findall(text))
+    return tokens
+
+
+class BM25Index:
+    """
+    Okapi BM25 over the RAG content chunks, stored as a compact inverted index.
+
+    Postings are kept in CSR form: the documents containing term `t` are
+    `doc_ids[indptr[t]:indptr[t + 1]]` with matching term frequencies in `term_freqs`.
+    """
+
+    def __init__(self, vocab, indptr, doc_ids, term_freqs, doc_lengths, k1=1.5, b=0.75):
+        self.vocab = vocab
+        self.term_to_id = {term: i for i, term in enumerate(vocab)}
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.term_freqs = term_freqs
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.num_docs = len(doc_lengths)
+        self.avg_doc_length = float(doc_lengths.mean()) if self.num_docs else 0.0
+        doc_freqs = np.diff(indptr)
+        self.idf = np.log(1.0 + (self.num_docs - doc_freqs + 0.5) / (doc_freqs + 0.5)).astype(np.float32)
+
+    @classmethod
+    def build(cls, chunks, k1=1.5, b=0.75):
+        """Build the index from a list of chunk strings; document ids are chunk positions."""
+        postings = {}
+        doc_lengths = np.zeros(len(chunks), dtype=np.int32)
+        for doc_id, chunk in enumerate(chunks):
+            counts = Counter(tokenize(chunk))
+            doc_lengths[doc_id] = sum(counts.values())
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc_id, tf))
+
+        vocab = sorted(postings)
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        for i, term in enumerate(vocab):
+            indptr[i + 1] = indptr[i] + len(postings[term])
+        doc_ids = np.empty(indptr[-1], dtype=np.int32)
+        term_freqs = np.empty(indptr[-1], dtype=np.uint16)
+        for i, term in enumerate(vocab):
+            entries = postings[term]
+            doc_ids[indptr[i]:indptr[i + 1]] = [doc_id for doc_id, _ in entries]
+            term_freqs[indptr[i]:indptr[i + 1]] = [min(tf, 65535) for _, tf in entries]
+        return cls(vocab, indptr, doc_ids, term_freqs, doc_lengths, k1, b)
+
+    def save(self, path):
+        """Write the index to `path` under a temporary name first, so readers never see a partial file."""
+        path = Path(path)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(
+                f,
+                vocab=np.array(self.vocab, dtype=str),
+                indptr=self.indptr,
+                doc_ids=self.doc_ids,
+                term_freqs=self.term_freqs,
+                doc_lengths=self.doc_lengths,
+                params=np.array([self.k1, self.b], dtype=np.float32),
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            k1, b = (float(x) for x in data["params"])
+            return cls(list(data["vocab"]), data["indptr"], data["doc_ids"], data["term_freqs"],
+                       data["doc_lengths"], k1, b)
+
+    def get_scores(self, query):
+        """BM25 score of every document for `query`."""
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        if self.num_docs == 0:
+            return scores
+        for term in set(tokenize(query)):
+            term_id = self.term_to_id.get(term)
+            if term_id is None:
+                continue
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            docs = self.doc_ids[start:end]
+            tf = self.term_freqs[start:end].astype(np.float32)
+            norm = self.k1 * (1.0 - self.b + self.b * self.doc_lengths[docs] / self.avg_doc_length)
+            scores[docs] += self.idf[term_id] * tf * (self.k1 + 1.0) / (tf + norm)
+        return scores
+
+    def search(self, query, k):
+        """Return (indices, scores) of the top-k documents with a non-zero score, best first."""
+        scores = self.get_scores(query)
+        k = min(k, self.num_docs)
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        top = top[scores[top] > 0]
+        return top, scores[top]
+
+
+def reciprocal_rank_fusion(rankings, k, rrf_k=60):
+    """
+    Fuse several ranked lists of document ids with reciprocal-rank fusion:
+    score(d) = sum over lists of 1 / (rrf_k + rank of d in that list).
+    Ids can be chunk ids or any hashable, sortable key such as (shard, chunk id).
+    Returns the top-k fused ids, best first.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            if isinstance(doc_id, (int, np.integer)):
+                doc_id = int(doc_id)
+                if doc_id < 0:
+                    continue
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (rrf_k + rank + 1)
+    return sorted(fused, key=lambda doc_id: (-fused[doc_id], doc_id))[:k]
+
+
+if __name__ == "__main__":
+    # Build the sparse index next to the FAISS index:
+    #   python -m modules.sparse_index [rag_cache_dir]
+    cache_dir = Path(sys.argv[1] if len(sys.argv) > 1 else "./rag_cache")
+    with open(cache_dir / "rag_content_chunks.pkl", "rb") as f:
+        chunks = pickle.load(f)
+    index = BM25Index.build(chunks)
+    output_path = cache_dir / "rag_bm25.npz"
+    index.save(output_path)
+    print(f"Built BM25 index over {index.num_docs} chunks ({len(index.vocab)} terms) at {output_path}")
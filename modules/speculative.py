@@ -0,0 +1,105 @@
+import logging
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+
+logger = logging.getLogger(__name__)
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s]", re.UNICODE)
+
+
+def normalize_hypothesis(text):
+    """Lowercase, drop punctuation and collapse whitespace so partials and finals compare equal."""
+    return " ".join(_PUNCTUATION_RE.sub(" ", text.lower()).split())
+
+
+class SpeculativeRetriever:
+    """
+    Pre-fetches retrieval results for stable partial transcripts.
+
+    Partial hypotheses are fed in through `observe` while the user is still
+    speaking. Once a hypothesis is stable (either every ASR item is marked stable
+    or the same text was seen `repeat_threshold` times in a row) `prefetch_fn`
+    is run for it on a background thread. Scheduling a newer hypothesis cancels
+    the older ones that have not started yet, so the lookup for the latest text
+    never queues behind superseded ones. When the final transcript arrives,
+    `take` hands back the pre-fetched result if the final text matches.
+    """
+
+    def __init__(self, prefetch_fn, repeat_threshold=2, min_words=3, max_entries=8):
+        self.prefetch_fn = prefetch_fn
+        self.repeat_threshold = repeat_threshold
+        self.min_words = min_words
+        self.max_entries = max_entries
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="speculative")
+        self._futures = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_hypothesis = None
+        self._repeat_count = 0
+        self.hits = 0
+        self.misses = 0
+
+    def reset(self):
+        """Forget the hypotheses of the previous utterance."""
+        with self._lock:
+            for future in self._futures.values():
+                future.cancel()
+            self._futures.clear()
+            self._last_hypothesis = None
+            self._repeat_count = 0
+
+    def observe(self, hypothesis, stable=False):
+        """Feed one partial hypothesis. Returns True if a pre-fetch was scheduled."""
+        key = normalize_hypothesis(hypothesis)
+        if len(key.split()) < self.min_words:
+            return False
+
+        with self._lock:
+            if key == self._last_hypothesis:
+                self._repeat_count += 1
+            else:
+                self._last_hypothesis = key
+                self._repeat_count = 1
+
+            if not stable and self._repeat_count < self.repeat_threshold:
+                return False
+            if key in self._futures:
+                return False
+
+            # Superseded pre-fetches still waiting for the worker are dropped; a running one finishes
+            for stale_key in [k for k, future in self._futures.items() if future.cancel()]:
+                del self._futures[stale_key]
+            self._futures[key] = self._executor.submit(self.prefetch_fn, hypothesis)
+            while len(self._futures) > self.max_entries:
+                _, stale = self._futures.popitem(last=False)
+                stale.cancel()
+            return True
+
+    def take(self, final_text, timeout=None):
+        """
+        Return the pre-fetched result for `final_text`, or None if nothing matches.
+        A pre-fetch that is still running is waited on, since it started earlier
+        than a fresh lookup would, but for at most `timeout` seconds.
+        """
+        key = normalize_hypothesis(final_text)
+        with self._lock:
+            future = self._futures.pop(key, None)
+        if future is None or future.cancelled():
+            self.misses += 1
+            return None
+        try:
+            result = future.result(timeout=timeout)
+        except FuturesTimeoutError:
+            logger.info("Speculative pre-fetch still running after %.2fs, not waiting for it", timeout)
+            self.misses += 1
+            return None
+        except Exception as e:
+            logger.error("Speculative pre-fetch failed: %s", e)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,7 +1,12 @@
 import os
+import logging
+import hashlib
+from pathlib import Path
 from elevenlabs.client import ElevenLabs
 from dotenv import load_dotenv
 
+logger = logging.getLogger(__name__)
+
 # Initialize ElevenLabs client
 load_dotenv()
 elevenlabs = ElevenLabs(api_key=os.getenv("ELEVENLABS_API"))  # Load API key from .env
@@ -16,37 +21,70 @@ dummy_pipeline_output = [
 VOICE_ID = "JBFqnCBsd6RMkjVDRZzb"  # Your specified voice
 MODEL_ID = "eleven_multilingual_v2"
 OUTPUT_FORMAT = "mp3_44100_128"
+# Pre-rendered clips (e.g. the deadline filler line) so they can be played without a TTS request
+CLIP_CACHE_DIR = Path("./rag_cache/audio")
 
 # Ensure output directory exists
 # os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-def save_audio_from_text(text, output_file, index):
+def save_audio_from_text(text, output_file, index, timeout=None):
     """
     Convert text to speech and save as MP3 using ElevenLabs.
     Args:
         text (str): Text to convert (e.g., pipeline response).
         output_file (str): Path to save MP3 (e.g., /content/response_0.mp3).
         index (int): Index for error reporting.
+        timeout (float): Request timeout in seconds, e.g. what is left of the turn's deadline.
     Returns:
         bool: True if successful, False otherwise.
     """
     try:
+        # Retries would each get the full timeout again and overrun the turn's deadline
+        request_options = {"timeout_in_seconds": timeout, "max_retries": 0} if timeout is not None else None
         audio_stream = elevenlabs.text_to_speech.convert(
             text=text,
             voice_id=VOICE_ID,
             model_id=MODEL_ID,
-            output_format=OUTPUT_FORMAT
+            output_format=OUTPUT_FORMAT,
+            request_options=request_options
         )
         with open(output_file, "wb") as f:
             for chunk in audio_stream:
                 if chunk:
                     f.write(chunk)
-        print(f"Audio saved for response {index} to {output_file}")
+        logger.info("Audio saved for response %s to %s", index, output_file)
         return True
     except Exception as e:
-        print(f"Error for response {index}: {e}")
+        logger.error("Error for response %s: %s", index, e)
         return False
 
+def _clip_path(text):
+    key = hashlib.sha1(f"{VOICE_ID}|{MODEL_ID}|{text}".encode("utf-8")).hexdigest()[:16]
+    return CLIP_CACHE_DIR / f"{key}.mp3"
+
+def rendered_clip(text):
+    """
+    Path of the pre-rendered clip of `text`, or None if it has not been rendered yet.
+    Never makes a TTS request, so it is safe to call from a turn that is out of time.
+    """
+    path = _clip_path(text)
+    return path if path.exists() else None
+
+def cached_clip(text):
+    """
+    Path of a pre-rendered clip of `text`, synthesizing it on first use.
+    Returns None if it is not cached and cannot be synthesized now.
+    """
+    path = _clip_path(text)
+    if path.exists():
+        return path
+    CLIP_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    if not save_audio_from_text(text, str(tmp_path), "clip"):
+        return None
+    os.replace(tmp_path, path)
+    return path
+
 def generate_speech_from_pipeline(pipeline_output):
     """
     Generate and save speech for each response in pipeline output.
@@ -56,12 +94,12 @@ def generate_speech_from_pipeline(pipeline_output):
     for index, item in enumerate(pipeline_output):
         response_text = item.get("response", "")
         if not response_text:
-            print(f"No response text for item {index}, skipping.")
+            logger.warning("No response text for item %d, skipping.", index)
             continue
         output_file = os.path.join(OUTPUT_DIR, f"response_{index}.mp3")
         success = save_audio_from_text(response_text, output_file, index)
         if not success:
-            print(f"Failed to save audio for response {index}: {response_text}")
+            logger.error("Failed to save audio for response %d", index, extra={"response_chars": len(response_text)})
 
 def main():
     # Use dummy data (replace with actual pipeline output)
@@ -4,17 +4,17 @@ import asyncio
 import threading
 from dotenv import load_dotenv
 import os
+import logging
 from modules.asr_module import stream_audio_to_transcribe
-import pygame
+from modules.workers import TkWorkerPool, AudioPlayer
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 os.environ["AWS_ACCESS_KEY_ID"] = os.getenv("AWS_ACCESS_KEY_ID")
 os.environ["AWS_SECRET_ACCESS_KEY"] = os.getenv("AWS_SECRET_ACCESS_KEY")
 os.environ["AWS_DEFAULT_REGION"] = os.getenv("AWS_DEFAULT_REGION", "us-west-2")
 
-# Initialize pygame mixer for audio playback
-pygame.mixer.init()
-
 class TranscriptionApp:
     def __init__(self, root):
         self.root = root
@@ -165,13 +165,20 @@ class TranscriptionApp:
         self.add_welcome_message()
         
         self.stop_event = None
-        self.transcript_store = {"final": ""}
+        self.transcript_store = {"final": "", "partial": ""}
         self.lang_code = "en-US"
         self.thread = None
         self.loop = None
-        self.update_user_data = None  # Callback function for storing user data
+        self.turn_id = 0  # Incremented on every new turn; results of older turns are dropped
+        self.update_user_data = None  # Callback that runs the response pipeline, returns (system output, turn deadline)
         self.get_system_response = None  # Callback to get processed response
-        self.play_audio_callback = None  # Callback to play TTS audio
+        self.synthesize_audio_callback = None  # Callback (text, turn deadline) that renders TTS audio to a file and returns its path
+        self.on_partial_transcript = None  # Callback for partial hypotheses (hypothesis, stable), runs on the ASR loop
+
+        # Blocking model/API calls run on the pool, playback is polled from the Tk loop
+        self.workers = TkWorkerPool(root)
+        self.audio_player = AudioPlayer(root)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
     def setup_styles(self):
         """Configure modern UI styles"""
@@ -207,40 +214,36 @@ class TranscriptionApp:
         # Force update the display
         self.root.update_idletasks()
         
-    def play_audio_response(self):
-        """Play audio using the callback if available, otherwise play sample.mp3"""
+    def play_audio_response(self, path, cleanup=False):
+        """Start non-blocking playback of an audio file; the UI stays responsive while it plays"""
         try:
-            # Update status to show audio is playing
-            self.status_label.config(text="🔊 Playing audio response...", fg="#2e7d32")
-            self.root.update_idletasks()
-            
-            # Use callback if available
-            if self.play_audio_callback and hasattr(self, 'last_response'):
-                self.play_audio_callback(self.last_response)
-            else:
-                # Fallback to sample.mp3
-                pygame.mixer.music.load("sample.mp3")
-                pygame.mixer.music.play()
-                
-                # Wait for the audio to finish
-                while pygame.mixer.music.get_busy():
-                    pygame.time.wait(100)
-                    self.root.update_idletasks()
-                
+            self.status_label.config(text="🔊 Playing audio response... (press a mic button to interrupt)", fg="#2e7d32")
+            self.audio_player.play(path, on_complete=self.on_playback_complete, cleanup=cleanup)
         except Exception as e:
-            print(f"Error playing audio: {e}")
+            logger.error("Error playing audio: %s", e)
             self.status_label.config(text="Audio playback failed", fg="#d32f2f")
-        finally:
-            # Reset status
+
+    def on_playback_complete(self, interrupted):
+        if not interrupted:
             self.status_label.config(text="Ready to listen...", fg="#1976d2")
 
-    async def get_model_response(self, query):
+    def get_model_response(self, query, lang_code, turn_id):
+        """Run the response pipeline for one turn and return (response, deadline). Blocking: called on the worker pool."""
+        result = None
+        if self.update_user_data:
+            # The pipeline checks `is_current` before recording the turn, so a barged-in turn leaves no history
+            result = self.update_user_data(query, lang_code, turn_id=turn_id, is_current=lambda: turn_id == self.turn_id)
+        if result is not None:
+            return result
         # Use the system response if callback is available
-        if self.get_system_response:
-            return self.get_system_response()
-        return "Hello world"
+        response = self.get_system_response() if self.get_system_response else None
+        return (response if response is not None else "Hello world"), None
 
     def start_transcription(self, lang_code):
+        # Barge-in: stop any playback and drop the results of the turn still in flight
+        self.audio_player.stop()
+        self.turn_id += 1
+
         self.lang_code = lang_code
         lang_name = "Hindi" if lang_code == "hi-IN" else "English"
         self.status_label.config(text=f"🎤 Listening in {lang_name}...", fg="#ff6b35")
@@ -250,8 +253,8 @@ class TranscriptionApp:
         self.hindi_button.config(state=tk.DISABLED, bg="#cccccc")
         self.english_button.config(state=tk.DISABLED, bg="#cccccc")
         
-        self.transcript_store = {"final": ""}
-        self.thread = threading.Thread(target=self.run_async_transcription)
+        self.transcript_store = {"final": "", "partial": ""}
+        self.thread = threading.Thread(target=self.run_async_transcription, args=(self.turn_id,), daemon=True)
         self.thread.start()
 
     def stop_transcription(self):
@@ -260,39 +263,87 @@ class TranscriptionApp:
         if self.loop and self.stop_event:
             self.loop.call_soon_threadsafe(self.stop_event.set)
 
-    def run_async_transcription(self):
+    def run_async_transcription(self, turn_id):
         self.loop = asyncio.new_event_loop()
         asyncio.set_event_loop(self.loop)
         self.stop_event = asyncio.Event()
-        self.loop.run_until_complete(self._transcribe_and_finish())
+        self.loop.run_until_complete(self._transcribe_and_finish(turn_id))
+
+    def handle_partial_transcript(self, hypothesis, stable):
+        """Forward a partial hypothesis to the callback and show it while the user is speaking"""
+        if self.on_partial_transcript:
+            try:
+                self.on_partial_transcript(hypothesis, stable)
+            except Exception as e:
+                logger.error("Error handling partial transcript: %s", e)
+        preview = hypothesis.strip()
+        if len(preview) > 60:
+            preview = "..." + preview[-57:]
+        if preview and not self.stop_event.is_set():
+            self.workers.call_in_main(lambda: self.status_label.config(text=f"🎤 {preview}", fg="#ff6b35"))
 
-    async def _transcribe_and_finish(self):
+    async def _transcribe_and_finish(self, turn_id):
         final_text, lang_code = await stream_audio_to_transcribe(
-            self.stop_event, self.transcript_store, None, self.lang_code
+            self.stop_event, self.transcript_store, None, self.lang_code,
+            on_partial=self.handle_partial_transcript
         )
-        
-        if final_text.strip():  # Only process if there's actual text
-            # Call the callback to store user input and language
-            if self.update_user_data:
-                self.update_user_data(final_text, lang_code)
-            
-            # Add user message and update display
-            self.root.after(0, lambda: self.add_message(final_text, "user"))
-            
-            # Get AI response
-            response = await self.get_model_response(final_text)
-            self.last_response = response  # Store for audio playback
-            
-            # Add AI response and update display
-            self.root.after(0, lambda: self.add_message(response, "assistant"))
-            
-            # Play audio response after chat is displayed
-            self.root.after(500, self.play_audio_response)
-        
-        # Reset UI state
-        self.root.after(0, lambda: self.status_label.config(text="Ready to listen...", fg="#1976d2"))
-        self.root.after(0, lambda: self.hindi_button.config(state=tk.NORMAL, bg="#ff6b35"))
-        self.root.after(0, lambda: self.english_button.config(state=tk.NORMAL, bg="#1976d2"))
+        # The ASR loop only transcribes; the rest of the turn is driven from the Tk thread
+        self.workers.call_in_main(self.on_final_transcript, final_text, lang_code, turn_id)
+
+    def on_final_transcript(self, final_text, lang_code, turn_id):
+        # Mic buttons are usable again right away so the user can barge in on this turn
+        self.hindi_button.config(state=tk.NORMAL, bg="#ff6b35")
+        self.english_button.config(state=tk.NORMAL, bg="#1976d2")
+
+        if not final_text.strip():  # Only process if there's actual text
+            self.status_label.config(text="Ready to listen...", fg="#1976d2")
+            return
+
+        self.add_message(final_text, "user")
+        self.status_label.config(text="💭 Thinking...", fg="#1976d2")
+        self.workers.submit(
+            self.get_model_response, final_text, lang_code, turn_id,
+            on_done=lambda result: self.on_model_response(*result, turn_id),
+            on_error=lambda e: self.on_turn_error(e, turn_id),
+        )
+
+    def on_model_response(self, response, deadline, turn_id):
+        if turn_id != self.turn_id:
+            return  # Superseded by a newer turn
+        self.last_response = response  # Store for audio playback
+        self.add_message(response, "assistant")
+
+        if self.synthesize_audio_callback:
+            self.status_label.config(text="🔊 Preparing audio...", fg="#2e7d32")
+            self.workers.submit(
+                self.synthesize_audio_callback, response, deadline,
+                on_done=lambda path: self.on_audio_ready(path, turn_id),
+                on_error=lambda e: self.on_turn_error(e, turn_id),
+            )
+        else:
+            # Fallback to sample.mp3
+            self.play_audio_response("sample.mp3")
+
+    def on_audio_ready(self, path, turn_id):
+        if turn_id != self.turn_id:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            return
+        self.play_audio_response(path, cleanup=True)
+
+    def on_turn_error(self, error, turn_id):
+        logger.error("Error processing turn: %s", error, extra={"turn_id": turn_id})
+        if turn_id == self.turn_id:
+            self.status_label.config(text="Something went wrong, please try again", fg="#d32f2f")
+
+    def on_close(self):
+        self.audio_player.stop()
+        if self.loop and self.stop_event:
+            self.loop.call_soon_threadsafe(self.stop_event.set)
+        self.workers.shutdown()
+        self.root.destroy()
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -0,0 +1,163 @@
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from modules.response_gen import get_bot_response, retrieve_context
+from modules.nlp_pipeline import middleman
+from modules.tts import save_audio_from_text, rendered_clip
+from modules.deadline import Deadline, FILLER_TEXT, LLM_MIN_SECONDS, TTS_RESERVE_SECONDS
+from modules.speculative import SpeculativeRetriever
+from modules.conversation_store import get_store, new_session_id
+from modules.model_registry import registry
+
+logger = logging.getLogger(__name__)
+
+# "intent" routes retrieval to the document-type shards matching the detected intents
+SHARD_ROUTING = os.getenv("SHARD_ROUTING", "none")
+# Longest a turn waits for intent detection before searching every shard instead
+INTENT_TIMEOUT_SECONDS = float(os.getenv("INTENT_TIMEOUT_SECONDS", "0.5"))
+
+# The zero-shot pipeline is used by one turn at a time
+_intent_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="intent")
+
+
+def _warm_intent_model():
+    try:
+        registry.get("zero_shot")
+    except Exception as e:
+        logger.error("Could not load the intent model, turns will search every shard: %s", e)
+
+# `timings` holds the seconds spent in the "rag" (intents, retrieval and LLM) and "rephrase" stages
+TurnResult = namedtuple("TurnResult", ["response", "deadline", "timings", "superseded"])
+
+
+class VoiceSession:
+    """
+    The turn pipeline of one voice conversation: speculative retrieval on partial
+    transcripts, shard routing, the RAG answer, the rephrase, the conversation store
+    and text-to-speech with its filler-clip fallback, all under the turn's deadline.
+
+    The voice app (main.py) and the replay harness (benchmarks/replay.py) both run
+    their turns through it; the replay swaps `tts_fn` and `filler_clip_fn` for fakes.
+    """
+
+    def __init__(self, session_id=None, store=None, tts_fn=save_audio_from_text, filler_clip_fn=rendered_clip,
+                 shard_routing=SHARD_ROUTING):
+        # Turns are persisted under this id (see modules/conversation_store.py) so a session can be replayed
+        self.session_id = session_id or new_session_id()
+        self.store = store
+        self.tts_fn = tts_fn
+        self.filler_clip_fn = filler_clip_fn
+        self.shard_routing = shard_routing
+        self.context = []
+        self.last_response = ""
+        # Turns run on a worker pool, so a barged-in turn may still be finishing
+        self.context_lock = threading.Lock()
+        # Retrieval is started on stable partial transcripts, before the user stops speaking
+        self.speculative_retriever = SpeculativeRetriever(self.prefetch_context)
+        if shard_routing == "intent":
+            # Imported lazily: the zero-shot model is only needed when routing by intent. It is pinned and
+            # loaded up front so no turn waits for it to be (re)loaded
+            import modules.intent_recognition  # noqa: F401 (registers the zero-shot model)
+            registry.pin("zero_shot")
+            threading.Thread(target=_warm_intent_model, daemon=True, name="intent-warmup").start()
+
+    def detect_query_intents(self, text, deadline):
+        """
+        Intents used for shard routing, or None when routing is off, the intent is ambiguous,
+        or detection does not finish within INTENT_TIMEOUT_SECONDS and the turn's budget.
+        """
+        if self.shard_routing != "intent":
+            return None
+        from modules import intent_recognition
+        future = _intent_executor.submit(intent_recognition.detect_intents, text)
+        timeout = min(INTENT_TIMEOUT_SECONDS, deadline.budget(reserve=LLM_MIN_SECONDS + TTS_RESERVE_SECONDS))
+        try:
+            intents, _ = future.result(timeout=max(0.0, timeout))
+        except FuturesTimeoutError:
+            deadline.fallback("all_shards")
+            return None
+        return None if "ambiguous" in intents else intents
+
+    def prefetch_context(self, hypothesis):
+        """
+        Retrieval for a partial transcript. Intents are only detected on the final transcript,
+        so this searches every shard; it is used when the final query is not routed either.
+        """
+        return retrieve_context(hypothesis)
+
+    def observe_partial(self, hypothesis, stable):
+        """Schedule speculative retrieval for a partial transcript."""
+        return self.speculative_retriever.observe(hypothesis, stable)
+
+    def respond(self, text, lang, turn_id=None, is_current=None, deadline=None):
+        """
+        Answer one final transcript and return a TurnResult. The turn's Deadline is returned
+        with the response so its text-to-speech runs on the same budget. If `is_current()` is
+        False by the time the response is ready the user has barged in: the response is never
+        shown or spoken, so it is left out of the conversation context.
+        """
+        # Each turn carries its own budget: a barged-in turn may still be finishing next to the new one
+        deadline = deadline or Deadline()
+        t0 = time.perf_counter()
+        intents = self.detect_query_intents(text, deadline)
+        deadline.check("intent")
+        # Reuse the context pre-fetched from the partial transcript when it matches the final one (and the final
+        # query is not routed to fewer shards). The pre-fetch ran without the turn's deadline, so it is waited on
+        # only while the LLM would still get its share; past that the turn retrieves again, and the
+        # deadline-aware lookup falls back to BM25 if it has to.
+        prefetched = None
+        if intents is None:
+            prefetched = self.speculative_retriever.take(
+                text, timeout=max(0.0, deadline.budget(reserve=LLM_MIN_SECONDS + TTS_RESERVE_SECONDS)))
+            deadline.check("retrieval")
+        self.speculative_retriever.reset()
+        data = get_bot_response(text, contexts=prefetched, intents=intents, deadline=deadline)
+        t1 = time.perf_counter()
+        with self.context_lock:
+            history = list(self.context)
+        response = middleman(text, history, data, deadline=deadline)
+        t2 = time.perf_counter()
+
+        superseded = is_current is not None and not is_current()
+        logger.info("System output", extra={"session_id": self.session_id, "turn_id": turn_id,
+                                            "response_chars": len(response), "superseded": superseded})
+        # Enqueued only; the conversation store commits it on its own thread
+        (self.store or get_store()).log_turn(
+            self.session_id, text, response, language=lang, intents=intents, turn_id=turn_id, superseded=superseded,
+            speculative_hit=prefetched is not None, rag_answer=data, fallbacks=deadline.fallbacks)
+        if not superseded:
+            with self.context_lock:
+                self.context.append({"user": text, "assistant": response})
+                self.last_response = response
+        return TurnResult(response, deadline, {"rag": t1 - t0, "rephrase": t2 - t1}, superseded)
+
+    def copy_filler_clip(self, output_file):
+        """Copy the pre-rendered filler clip to `output_file`; False if it has not been rendered."""
+        clip = self.filler_clip_fn(FILLER_TEXT)
+        if clip is None:
+            return False
+        shutil.copyfile(clip, output_file)
+        return True
+
+    def synthesize(self, text, output_file, deadline=None):
+        """
+        Render `text` to `output_file` with what is left of the turn's `deadline`; if TTS fails
+        the filler clip is copied there instead. Finishes the deadline. Returns True on success.
+        """
+        timeout = deadline.timeout() if deadline is not None else None
+        # The filler clip is only looked up here, never synthesized; main() renders it ahead of time
+        if text == FILLER_TEXT:
+            ok = self.copy_filler_clip(output_file) or self.tts_fn(text, output_file, 0, timeout=timeout)
+        else:
+            ok = self.tts_fn(text, output_file, 0, timeout=timeout)
+            if not ok and deadline is not None:
+                deadline.fallback("filler_clip")
+                ok = self.copy_filler_clip(output_file)
+        if deadline is not None:
+            deadline.check("tts")
+            deadline.finish()
+        return ok
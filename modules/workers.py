@@ -0,0 +1,128 @@
+import logging
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
+import pygame
+
+logger = logging.getLogger(__name__)
+
+
+class TkWorkerPool:
+    """
+    Runs blocking pipeline calls (embedding, LLM and TTS requests) on a thread pool
+    and hands their results back to the Tk main loop.
+
+    Completed jobs are put on a results queue that the Tk main loop drains every
+    `poll_interval_ms`, so `on_done` / `on_error` callbacks always run on the Tk
+    thread and may touch widgets directly.
+    """
+
+    def __init__(self, root, max_workers=2, poll_interval_ms=50):
+        self.root = root
+        self.poll_interval_ms = poll_interval_ms
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="cana-worker")
+        self._results = queue.Queue()
+        self._closed = False
+        self.root.after(self.poll_interval_ms, self._drain)
+
+    def submit(self, fn, *args, on_done=None, on_error=None, **kwargs):
+        """Queue `fn(*args, **kwargs)` on the pool; the callbacks receive its result or exception on the Tk thread."""
+        future = self._executor.submit(fn, *args, **kwargs)
+        future.add_done_callback(lambda f: self._results.put((self._deliver, (f, on_done, on_error))))
+        return future
+
+    def call_in_main(self, fn, *args):
+        """Run `fn(*args)` on the Tk thread. Safe to call from any thread."""
+        self._results.put((fn, args))
+
+    def _deliver(self, future, on_done, on_error):
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            if on_error:
+                on_error(error)
+            else:
+                logger.error("Background job failed: %s", error)
+        elif on_done:
+            on_done(future.result())
+
+    def _drain(self):
+        while True:
+            try:
+                fn, args = self._results.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                fn(*args)
+            except Exception as e:
+                logger.exception("Error in UI callback: %s", e)
+        if not self._closed:
+            self.root.after(self.poll_interval_ms, self._drain)
+
+    def shutdown(self):
+        self._closed = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class AudioPlayer:
+    """
+    Non-blocking pygame playback driven by the Tk main loop.
+
+    Instead of busy-waiting on `pygame.mixer.music.get_busy()`, playback state is
+    polled with `root.after` and `on_complete(interrupted)` is called once the clip
+    ends or is stopped by a barge-in.
+    """
+
+    def __init__(self, root, poll_interval_ms=100):
+        self.root = root
+        self.poll_interval_ms = poll_interval_ms
+        self._path = None
+        self._cleanup = False
+        self._on_complete = None
+        self._poll_id = None
+        if not pygame.mixer.get_init():
+            pygame.mixer.init()
+
+    @property
+    def is_playing(self):
+        return self._path is not None
+
+    def play(self, path, on_complete=None, cleanup=False):
+        """Start playing `path`; if `cleanup` is set the file is deleted when playback ends."""
+        self.stop()
+        pygame.mixer.music.load(path)
+        pygame.mixer.music.play()
+        self._path = path
+        self._cleanup = cleanup
+        self._on_complete = on_complete
+        self._poll_id = self.root.after(self.poll_interval_ms, self._poll)
+
+    def stop(self):
+        """Interrupt the current clip, if any."""
+        if self.is_playing:
+            pygame.mixer.music.stop()
+            self._finish(interrupted=True)
+
+    def _poll(self):
+        self._poll_id = None
+        if pygame.mixer.music.get_busy():
+            self._poll_id = self.root.after(self.poll_interval_ms, self._poll)
+        else:
+            self._finish(interrupted=False)
+
+    def _finish(self, interrupted):
+        if self._poll_id is not None:
+            self.root.after_cancel(self._poll_id)
+            self._poll_id = None
+        path, cleanup, on_complete = self._path, self._cleanup, self._on_complete
+        self._path = None
+        self._on_complete = None
+        pygame.mixer.music.unload()
+        if cleanup:
+            try:
+                os.unlink(path)
+            except OSError as e:
+                logger.warning("Could not remove audio file %s: %s", path, e)
+        if on_complete:
+            on_complete(interrupted)
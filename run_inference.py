@@ -1,14 +1,18 @@
 import argparse
+from modules.app_logging import configure_logging
+configure_logging()
 # from modules.rag_pipeline import run_rag_pipeline
 from modules.response_gen import generate_csv_with_answers
 def main():
     parser = argparse.ArgumentParser(description="Run inference on test questions using RAG pipeline.")
     parser.add_argument("--test_csv", type=str, required=True, help="Path to the CSV file with test questions.")
     parser.add_argument("--output_csv", type=str, default="output/responses.csv", help="Path where output CSV will be saved.")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes to answer questions with.")
+    parser.add_argument("--threads_per_worker", type=int, default=None, help="Torch threads per worker process (default: CPU count / workers).")
     
     args = parser.parse_args()
 
-    generate_csv_with_answers(input_csv_path=args.test_csv, output_csv_path=args.output_csv)
+    generate_csv_with_answers(input_csv_path=args.test_csv, output_csv_path=args.output_csv, workers=args.workers, threads_per_worker=args.threads_per_worker)
 
 if __name__ == "__main__":
     main()
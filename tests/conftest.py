@@ -0,0 +1,8 @@
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# The tests swap Groq, the rephrase call and the encoder for local fakes; nothing is downloaded or called
+os.environ.setdefault("GROQ_API_KEY", "unused-in-tests")
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
@@ -0,0 +1,288 @@
+"""Turn deadline fallbacks (modules/deadline.py) with slow fake backends in place of Groq."""
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+from benchmarks.fakes import StubLLMClient, stub_interpret_command
+from modules import metrics, nlp_pipeline, response_gen
+from modules.deadline import Deadline, FILLER_TEXT, LLM_MIN_SECONDS, REPHRASE_MIN_SECONDS, TTS_RESERVE_SECONDS
+from modules.faq import FAQ_ANSWERS
+from modules.sparse_index import BM25Index
+from modules.voice_session import VoiceSession
+
+CONTEXTS = ["LenDenClub is a peer-to-peer lending platform registered with the RBI as an NBFC-P2P."]
+UNKNOWN_QUESTION = "How many employees work here?"
+CHUNKS = ["registration needs PAN and Aadhaar", "repayments are monthly", "the platform is regulated by the RBI"]
+
+
+@pytest.fixture(autouse=True)
+def pipeline(monkeypatch):
+    metrics.reset()
+    # The answer path only needs an encoder to exist; contexts are passed in, so it is never called
+    monkeypatch.setattr(response_gen, "query_encoder", object())
+    monkeypatch.setattr(response_gen.artifact_manager, "current", lambda: SimpleNamespace(content_chunks=CONTEXTS))
+    with response_gen.answer_cache_lock:
+        response_gen.answer_cache.clear()
+    yield
+    with response_gen.answer_cache_lock:
+        response_gen.answer_cache.clear()
+
+
+def use_llm(monkeypatch, latency=0.0, answer="This is a stubbed answer."):
+    llm = StubLLMClient(latency=latency, answer=answer)
+    monkeypatch.setattr(response_gen, "client", llm)
+    return llm
+
+
+def use_rephrase(monkeypatch, latency=0.0):
+    calls = []
+    interpret = stub_interpret_command(latency=latency)
+
+    def counted(user_input, timeout=None):
+        calls.append(timeout)
+        return interpret(user_input, timeout=timeout)
+    monkeypatch.setattr(nlp_pipeline, "interpret_command_with_api", counted)
+    return calls
+
+
+def counters():
+    return metrics.snapshot()["counters"]
+
+
+def test_slow_llm_gets_a_single_attempt_within_the_budget(monkeypatch):
+    llm = use_llm(monkeypatch, latency=10.0)
+    deadline = Deadline(2.0)
+    start = time.monotonic()
+    answer = response_gen.get_bot_response(UNKNOWN_QUESTION, contexts=CONTEXTS, deadline=deadline)
+    elapsed = time.monotonic() - start
+
+    assert answer == FILLER_TEXT
+    # The SDK's default retries would each get the timeout again and blow the budget
+    assert llm.attempts == 1
+    assert elapsed < deadline.budget_s - TTS_RESERVE_SECONDS + 0.2
+
+
+def test_llm_timeout_falls_back_to_the_faq(monkeypatch):
+    use_llm(monkeypatch, latency=10.0)
+    question = "Kya interest rate hai?"
+    answer = response_gen.get_bot_response(question, contexts=CONTEXTS, deadline=Deadline(1.5))
+
+    assert answer == FAQ_ANSWERS[question.lower()]
+    assert counters()["slo.fallback.faq"] == 1
+
+
+def test_llm_timeout_replays_a_cached_answer(monkeypatch):
+    use_llm(monkeypatch, answer="Yes, your investment is safe.")
+    question = "Kya LendenClub me mera investment safe hai?"
+    assert response_gen.get_bot_response(question, contexts=CONTEXTS, deadline=Deadline(5.0)) == "Yes, your investment is safe."
+
+    use_llm(monkeypatch, latency=10.0)
+    answer = response_gen.get_bot_response(question, contexts=CONTEXTS, deadline=Deadline(1.5))
+
+    assert answer == "Yes, your investment is safe."
+    assert counters()["slo.fallback.answer_cache"] == 1
+    assert "slo.fallback.faq" not in counters()
+
+
+def test_llm_timeout_without_cache_or_faq_answers_with_the_filler(monkeypatch):
+    use_llm(monkeypatch, latency=10.0)
+    answer = response_gen.get_bot_response(UNKNOWN_QUESTION, contexts=CONTEXTS, deadline=Deadline(1.5))
+
+    assert answer == FILLER_TEXT
+    assert counters()["slo.fallback.filler"] == 1
+
+
+def test_rephrase_is_skipped_when_the_budget_is_nearly_spent(monkeypatch):
+    calls = use_rephrase(monkeypatch)
+    deadline = Deadline(TTS_RESERVE_SECONDS + REPHRASE_MIN_SECONDS / 2)
+    response = nlp_pipeline.middleman("Is my money safe?", [], "Yes, it is.", deadline=deadline)
+
+    assert response == "Yes, it is."
+    assert calls == []
+    assert counters()["slo.fallback.skip_rephrase"] == 1
+
+
+def test_slow_rephrase_falls_back_to_the_rag_answer(monkeypatch):
+    calls = use_rephrase(monkeypatch, latency=10.0)
+    deadline = Deadline(TTS_RESERVE_SECONDS + REPHRASE_MIN_SECONDS + 0.2)
+    response = nlp_pipeline.middleman("Is my money safe?", [], "Yes, it is.", deadline=deadline)
+
+    assert response == "Yes, it is."
+    assert len(calls) == 1 and calls[0] <= deadline.budget_s - TTS_RESERVE_SECONDS
+    assert counters()["slo.fallback.skip_rephrase"] == 1
+    # The rephrase gave up in time to leave the TTS reserve
+    assert deadline.remaining() >= TTS_RESERVE_SECONDS - 0.1
+
+
+def test_filler_text_is_not_rephrased(monkeypatch):
+    calls = use_rephrase(monkeypatch)
+    assert nlp_pipeline.middleman("Is my money safe?", [], FILLER_TEXT, deadline=Deadline(5.0)) == FILLER_TEXT
+    assert calls == []
+
+
+def test_a_missed_turn_is_blamed_on_the_llm(monkeypatch):
+    use_llm(monkeypatch, latency=10.0)
+    deadline = Deadline(0.2)
+    response_gen.get_bot_response(UNKNOWN_QUESTION, contexts=CONTEXTS, deadline=deadline)
+    deadline.finish()
+
+    assert counters()["slo.turns"] == 1
+    assert counters()["slo.misses"] == 1
+    assert counters()["slo.miss.llm"] == 1
+
+
+def test_a_turn_within_budget_records_no_miss(monkeypatch):
+    use_llm(monkeypatch)
+    use_rephrase(monkeypatch)
+    deadline = Deadline(5.0)
+    data = response_gen.get_bot_response("Is my money safe?", contexts=CONTEXTS, deadline=deadline)
+    nlp_pipeline.middleman("Is my money safe?", [], data, deadline=deadline)
+    deadline.finish()
+
+    assert counters()["slo.turns"] == 1
+    assert "slo.misses" not in counters()
+    assert not any(name.startswith("slo.fallback.") for name in counters())
+
+
+class NullStore:
+    def log_turn(self, *args, **kwargs):
+        pass
+
+
+@pytest.fixture
+def stalled_dense_search(monkeypatch):
+    """A FAISS lookup that hangs until the test ends."""
+    release = threading.Event()
+    monkeypatch.setattr(response_gen, "dense_search", lambda query, k, artifacts=None: release.wait(5.0) and [])
+    yield
+    release.set()
+
+
+def test_stalled_dense_lookup_falls_back_to_bm25(monkeypatch, stalled_dense_search):
+    artifacts = SimpleNamespace(content_chunks=CHUNKS, bm25_index=BM25Index.build(CHUNKS))
+    deadline = Deadline(LLM_MIN_SECONDS + TTS_RESERVE_SECONDS + 0.3)
+    start = time.monotonic()
+    ids = response_gen.retrieve_chunk_ids("how do repayments work", k=2, mode="hybrid", artifacts=artifacts, deadline=deadline)
+
+    assert ids[0] == 1
+    assert time.monotonic() - start < 1.0
+    assert counters()["slo.fallback.sparse_only"] == 1
+
+
+def test_a_stalled_prefetch_does_not_hold_the_turn(monkeypatch, stalled_dense_search):
+    artifacts = SimpleNamespace(content_chunks=CHUNKS, bm25_index=BM25Index.build(CHUNKS), shards=None)
+    monkeypatch.setattr(response_gen.artifact_manager, "current", lambda: artifacts)
+    use_llm(monkeypatch)
+    use_rephrase(monkeypatch)
+    session = VoiceSession(store=NullStore(), shard_routing="none")
+    question = "how do repayments work"
+    # The voice app feeds every final segment in as a stable partial, so the turn's retrieval is a pre-fetch
+    assert session.observe_partial(question, True)
+    deadline = Deadline(LLM_MIN_SECONDS + TTS_RESERVE_SECONDS + 0.5)
+    start = time.monotonic()
+    result = session.respond(question, "en-US", deadline=deadline)
+
+    assert time.monotonic() - start < deadline.budget_s - TTS_RESERVE_SECONDS
+    assert result.response == "This is a stubbed answer."
+    assert counters()["slo.fallback.sparse_only"] == 1
+    assert deadline.missed_in is None
+    session.speculative_retriever.shutdown()
+
+
+class RecordingTTS:
+    """Stands in for ElevenLabs: records each request's timeout and fails if `ok` is False."""
+
+    def __init__(self, ok):
+        self.ok = ok
+        self.timeouts = []
+
+    def __call__(self, text, output_file, index, timeout=None):
+        self.timeouts.append(timeout)
+        if self.ok:
+            with open(output_file, "wb") as f:
+                f.write(b"speech")
+        return self.ok
+
+
+def test_failed_tts_plays_the_filler_clip(tmp_path):
+    clip = tmp_path / "filler.mp3"
+    clip.write_bytes(b"filler")
+    tts = RecordingTTS(ok=False)
+    session = VoiceSession(store=NullStore(), tts_fn=tts, filler_clip_fn=lambda text: clip)
+    deadline = Deadline(2.0)
+    output = tmp_path / "reply.mp3"
+
+    assert session.synthesize("Yes, it is.", str(output), deadline)
+    assert output.read_bytes() == b"filler"
+    assert len(tts.timeouts) == 1 and 0 < tts.timeouts[0] <= 2.0
+    assert counters()["slo.fallback.filler_clip"] == 1
+    assert counters()["slo.turns"] == 1
+
+
+def test_unrendered_filler_clip_is_synthesized_within_the_budget(tmp_path, monkeypatch):
+    from modules import tts as tts_module
+    monkeypatch.setattr(tts_module, "CLIP_CACHE_DIR", tmp_path / "clips")
+    # Looking the clip up must not make a request of its own
+    monkeypatch.setattr(tts_module, "save_audio_from_text", lambda *args, **kwargs: pytest.fail("clip lookup synthesized"))
+    tts = RecordingTTS(ok=True)
+    session = VoiceSession(store=NullStore(), tts_fn=tts)
+    deadline = Deadline(1.0)
+
+    assert session.synthesize(FILLER_TEXT, str(tmp_path / "reply.mp3"), deadline)
+    assert len(tts.timeouts) == 1 and tts.timeouts[0] <= 1.0
+
+
+@pytest.fixture
+def intent_routing(monkeypatch):
+    """A session that routes by intent, with the zero-shot model replaced by `detect`."""
+    from modules import intent_recognition, voice_session
+    monkeypatch.setattr(voice_session, "_warm_intent_model", lambda: None)
+    calls = []
+    release = threading.Event()
+
+    def use(intents, latency=0.0):
+        def detect(query):
+            calls.append(query)
+            release.wait(latency)
+            return intents, [0.9] * len(intents)
+        monkeypatch.setattr(intent_recognition, "detect_intents", detect)
+        return calls
+    yield use
+    release.set()
+
+
+def test_intents_are_detected_once_on_the_final_transcript(monkeypatch, intent_routing):
+    artifacts = SimpleNamespace(content_chunks=CHUNKS, bm25_index=BM25Index.build(CHUNKS), shards=None)
+    monkeypatch.setattr(response_gen.artifact_manager, "current", lambda: artifacts)
+    routed = []
+    monkeypatch.setattr(response_gen, "retrieve_context", lambda query, intents=None, **kwargs: routed.append(intents) or CONTEXTS)
+    calls = intent_routing(["credit_score_inquiry"])
+    use_llm(monkeypatch)
+    use_rephrase(monkeypatch)
+    session = VoiceSession(store=NullStore(), shard_routing="intent")
+    for partial in ("what is my", "what is my credit", "what is my credit score"):
+        session.observe_partial(partial, True)
+    result = session.respond("what is my credit score", "en-US", deadline=Deadline(5.0))
+
+    assert calls == ["what is my credit score"]
+    # A routed turn searches its shards rather than reusing the pre-fetch over every shard
+    assert routed == [["credit_score_inquiry"]]
+    assert result.response == "This is a stubbed answer."
+    session.speculative_retriever.shutdown()
+
+
+def test_slow_intent_detection_falls_back_to_every_shard(monkeypatch, intent_routing):
+    from modules.voice_session import INTENT_TIMEOUT_SECONDS
+    routed = []
+    monkeypatch.setattr(response_gen, "retrieve_context", lambda query, intents=None, **kwargs: routed.append(intents) or CONTEXTS)
+    intent_routing(["credit_score_inquiry"], latency=5.0)
+    use_llm(monkeypatch)
+    use_rephrase(monkeypatch)
+    session = VoiceSession(store=NullStore(), shard_routing="intent")
+    start = time.monotonic()
+    session.respond("what is my credit score", "en-US", deadline=Deadline(5.0))
+
+    assert time.monotonic() - start < INTENT_TIMEOUT_SECONDS + 0.5
+    assert routed == [None]
+    assert counters()["slo.fallback.all_shards"] == 1
+    session.speculative_retriever.shutdown()
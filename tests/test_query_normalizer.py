@@ -0,0 +1,74 @@
+"""Query normalization (modules/query_normalizer.py): transliteration, identifiers and cache keys."""
+import pytest
+from modules.query_normalizer import cache_key, faq_key, normalize_query, retrieval_text, transliterate
+from modules.sparse_index import BM25Index, tokenize
+
+
+@pytest.mark.parametrize("word, expected", [
+    ("कैसे", "kaise"),
+    ("ट्रैक", "traik"),
+    ("हूँ", "hun"),
+    ("ज़रूरत", "zarurat"),
+    ("ऋण", "rin"),
+    ("मेरा", "mera"),
+])
+def test_transliterates_devanagari_to_hinglish(word, expected):
+    assert transliterate(word) == expected
+
+
+@pytest.mark.parametrize("word, expected", [
+    # The inherent vowel is dropped at the end of a word ...
+    ("कमल", "kamal"),
+    # ... and between a vowel-bearing syllable and a consonant + vowel
+    ("सकता", "sakta"),
+    ("जनता", "janta"),
+    # but not when it is the only vowel before the consonant
+    ("कर", "kar"),
+])
+def test_deletes_the_schwa(word, expected):
+    assert transliterate(word) == expected
+
+
+def test_devanagari_and_hinglish_variants_share_the_normalized_text():
+    hindi = normalize_query("लेनदेन क्लब में पैसा कैसे ट्रैक कर सकता हूँ?")
+    hinglish = normalize_query("Lenden Club me paisa kese track kar sakti hu")
+
+    assert hindi.language == "hi" and hinglish.language == "hinglish"
+    assert hindi.text == hinglish.text == "lendenclub mein money kaise track kar sakta hoon"
+    assert cache_key(hindi.text) == cache_key("Lenden Club me paisa kese track kar sakti hu")
+
+
+@pytest.mark.parametrize("query, token", [
+    ("What does circular NRBI/DNBR/2017-18/57 say?", "nrbi/dnbr/2017-18/57"),
+    ("Is the rate 11.5% per year?", "11.5"),
+    ("Explain the peer-to-peer model", "peer-to-peer"),
+])
+def test_identifiers_and_decimals_stay_whole(query, token):
+    assert token in retrieval_text(query).split()
+    assert token in tokenize(retrieval_text(query))
+
+
+def test_identifier_query_matches_the_whole_identifier_in_bm25():
+    chunks = ["Circular NRBI/DNBR/2017-18/57 sets the lending limits.",
+              "Circular NRBI/DNBR/2016-17/45 covers the registration of platforms."]
+    index = BM25Index.build(chunks)
+    raw_ids, raw_scores = index.search("nrbi/dnbr/2017-18/57", 2)
+    ids, scores = index.search(retrieval_text("What does NRBI/DNBR/2017-18/57 say?"), 2)
+
+    assert ids[0] == 0
+    assert scores[0] >= raw_scores[0]
+
+
+@pytest.mark.parametrize("first, second", [
+    ("Should I invest in LenDenClub?", "How do I invest in LenDenClub?"),
+    ("Should I invest in LenDenClub?", "Can I invest in LenDenClub?"),
+    ("Is it safe for me?", "Is it safe for you?"),
+    ("Withdraw money from LenDenClub to my bank", "Withdraw money from my bank to LenDenClub"),
+])
+def test_different_questions_do_not_share_a_cache_key(first, second):
+    assert cache_key(first) != cache_key(second)
+
+
+def test_faq_key_ignores_stopwords_plurals_and_word_order():
+    assert faq_key("Kya loan jaldi mil sakta hai?") == faq_key("loan jaldi mil sakti hai kya")
+    assert faq_key("registration documents") == faq_key("document ki registration")
@@ -0,0 +1,63 @@
+"""Publishing and loading versions of the RAG artifacts (modules/rag_artifacts.py)."""
+import pickle
+import time
+import faiss
+import numpy as np
+from modules import metrics
+from modules.rag_artifacts import ArtifactManager, load_artifact_dir, publish_artifacts
+
+CHUNKS = ["registration needs PAN and Aadhaar", "repayments are monthly", "the platform is regulated by the RBI"]
+MODEL_ID = "test-encoder@torch"
+
+
+def write_source(path):
+    path.mkdir()
+    index = faiss.IndexFlatL2(4)
+    index.add(np.random.default_rng(0).random((len(CHUNKS), 4), dtype=np.float32))
+    faiss.write_index(index, str(path / "rag_faiss.index"))
+    with open(path / "rag_content_chunks.pkl", "wb") as f:
+        pickle.dump(CHUNKS, f)
+    return path
+
+
+def snapshot(path):
+    return {p.relative_to(path): p.stat().st_mtime_ns for p in path.rglob("*")}
+
+
+def test_publish_saves_the_derived_artifacts_with_the_version(tmp_path):
+    version = publish_artifacts(write_source(tmp_path / "source"), tmp_path / "cache", "v1", MODEL_ID)
+    version_dir = tmp_path / "cache" / "versions" / version
+
+    assert (version_dir / "rag_bm25.npz").exists()
+    assert (version_dir / "rag_chunk_embeddings.f16").exists()
+    artifacts = load_artifact_dir(version_dir, version, MODEL_ID)
+    assert artifacts.chunk_embeddings.model_id == MODEL_ID
+    assert artifacts.bm25_index.search("monthly repayments", 1)[0][0] == 1
+
+
+def test_loading_never_writes_to_the_artifact_dir(tmp_path):
+    source = write_source(tmp_path / "source")
+    before = snapshot(source)
+    artifacts = load_artifact_dir(source, "legacy", MODEL_ID)
+
+    assert snapshot(source) == before
+    # The missing pieces are still served, from memory
+    assert artifacts.bm25_index is not None
+    assert len(artifacts.chunk_embeddings) == len(CHUNKS)
+
+
+def test_watcher_does_not_retry_a_broken_version(tmp_path):
+    metrics.reset()
+    cache = tmp_path / "cache"
+    publish_artifacts(write_source(tmp_path / "source"), cache, "v1", MODEL_ID)
+    manager = ArtifactManager(cache, MODEL_ID)
+    assert manager.reload()
+
+    (cache / "versions" / "v2").mkdir()
+    (cache / "CURRENT").write_text("v2", encoding="utf-8")
+    manager.start_watcher(interval=0.05)
+    time.sleep(0.5)
+    manager.stop_watcher()
+
+    assert metrics.snapshot()["counters"]["rag.reload_failures"] == 1
+    assert manager.current().version == "v1"
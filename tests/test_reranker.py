@@ -0,0 +1,50 @@
+"""Time cap of the cross-encoder re-ranking stage (modules/reranker.py) with a fake scorer."""
+import time
+import pytest
+from modules import metrics, reranker
+
+
+class SlowScorer:
+    """Scores passages by length, taking `seconds_per_pair` per passage."""
+
+    def __init__(self, seconds_per_pair):
+        self.seconds_per_pair = seconds_per_pair
+        self.scored = 0
+
+    def score(self, query, passages):
+        time.sleep(self.seconds_per_pair * len(passages))
+        self.scored += len(passages)
+        return [float(len(passage)) for passage in passages]
+
+
+@pytest.fixture
+def scorer(monkeypatch):
+    metrics.reset()
+    scorer = SlowScorer(seconds_per_pair=0.01)
+    monkeypatch.setattr(reranker.registry, "get", lambda name: scorer)
+    return scorer
+
+
+PASSAGES = ["a" * n for n in (1, 5, 2, 8, 3, 9, 4, 7, 6, 10, 12, 11, 15, 13, 14, 16, 20, 18, 17, 19)]
+
+
+def test_without_a_cap_every_passage_is_scored(scorer):
+    order = reranker.rerank("query", PASSAGES, top_n=3, time_cap_s=10.0)
+    assert scorer.scored == len(PASSAGES)
+    assert [len(PASSAGES[i]) for i in order] == [20, 19, 18]
+
+
+def test_the_cap_bounds_latency_and_keeps_first_stage_order_for_the_rest(scorer):
+    start = time.perf_counter()
+    order = reranker.rerank("query", PASSAGES, top_n=len(PASSAGES), batch_size=4, time_cap_s=0.1)
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.1 + 0.02
+    assert 0 < scorer.scored < len(PASSAGES)
+    assert order[scorer.scored:] == list(range(scorer.scored, len(PASSAGES)))
+    assert metrics.snapshot()["counters"]["rerank.time_capped"] == 1
+
+
+def test_no_time_left_scores_nothing(scorer):
+    assert reranker.rerank("query", PASSAGES, top_n=3, time_cap_s=0.0) == [0, 1, 2]
+    assert scorer.scored == 0